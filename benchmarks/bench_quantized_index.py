@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from spot_catalog import SpotCatalog, description_chunks
+from vector_index import LocalVectorIndex
+from fakes import FakeEmbeddings, build_catalog, DIRECTIONS, BOTTOMS
+
+# Memory, scan cost, latency and recall@k of quantised and multi-vector catalogs, against the
+# full-precision single-vector catalog as reference.
+# Synthetic:  PYTHONPATH=src:benchmarks python benchmarks/bench_quantized_index.py --spots 20000
+# Real data:  PYTHONPATH=src:benchmarks python benchmarks/bench_quantized_index.py \
+#                 --reference data/spot_catalog --ground-truth notebooks/ground_truth_rag_surf.json
+
+# name -> (embedding dtype, float32 rescoring, chunk vectors)
+VARIANTS = {
+    "float32": ("float32", False, False),
+    "float16": ("float16", False, False),
+    "int8": ("int8", False, False),
+    "int8-rescore": ("int8", True, False),
+    "float32-chunks": ("float32", False, True),
+    "int8-chunks": ("int8", False, True),
+}
+
+def synthetic_chunks(vectors: np.ndarray, per_spot: int, seed: int) -> Tuple[np.ndarray, List[int]]:
+    """Each spot's vector plus per_spot - 1 perturbed copies, standing in for its chunk vectors"""
+    rng = np.random.default_rng(seed)
+    chunks, rows = [], []
+    for row, vector in enumerate(vectors):
+        noise = rng.standard_normal((per_spot - 1, len(vector))) * 0.5 / np.sqrt(len(vector))
+        chunks.extend([vector, *(vector + noise)])
+        rows.extend([row] * per_spot)
+    return np.asarray(chunks, dtype=np.float32), rows
+
+def text_chunks(descriptions: List[str], embeddings) -> Tuple[np.ndarray, List[int]]:
+    texts, rows = [], []
+    for row, description in enumerate(descriptions):
+        chunks = description_chunks(description)
+        texts.extend(chunks)
+        rows.extend([row] * len(chunks))
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32), rows
+
+def directory_bytes(path: str) -> int:
+    """Size of the catalog's current generation (the arrays) plus its manifest"""
+    data_path = SpotCatalog(path).data_path
+    return (os.path.getsize(os.path.join(path, "manifest.json"))
+            + sum(os.path.getsize(os.path.join(data_path, name)) for name in os.listdir(data_path)))
+
+def recall(reference: List[List[str]], results: List[List[str]]) -> float:
+    """Mean fraction of the reference top-k ids found in the candidate top-k"""
+    hits = [len(set(ref) & set(got)) / len(ref) for ref, got in zip(reference, results) if ref]
+    return float(np.mean(hits)) if hits else 1.0
+
+def run_queries(index: LocalVectorIndex, queries: np.ndarray, filters: List[Optional[Dict]],
+                top_k: int) -> Tuple[List[List[str]], List[float]]:
+    ids, latencies = [], []
+    for vector, metadata_filter in zip(queries, filters):
+        start = time.perf_counter()
+        result = index.query(vector, top_k=top_k, filter=metadata_filter, include_metadata=False)
+        latencies.append(time.perf_counter() - start)
+        ids.append([match["id"] for match in result["matches"]])
+    return ids, latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare quantised and chunked local catalogs.")
+    parser.add_argument("--spots", type=int, default=20000, help="Synthetic catalog size")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic queries")
+    parser.add_argument("--chunks-per-spot", type=int, default=4, help="Synthetic chunk vectors per spot")
+    parser.add_argument("--reference", default=None,
+                        help="float32 spot catalog to compare against, instead of a synthetic one")
+    parser.add_argument("--ground-truth", default=None,
+                        help="Eval ground truth whose queries and filters are used with --reference")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.reference:
+            if not args.ground_truth:
+                parser.error("--reference needs --ground-truth")
+            from search import create_embeddings
+            embeddings = create_embeddings()
+            reference_dir = args.reference
+            catalog = SpotCatalog(reference_dir)
+            if catalog.manifest.get("embedding_dtype") != "float32" or catalog.chunk_matrix() is not None:
+                parser.error("--reference must be a float32 catalog without chunk vectors")
+            with open(args.ground_truth, "r", encoding="utf-8") as f:
+                ground_truth = json.load(f)
+            queries = np.asarray([embeddings.embed_query(item["Query"]) for item in ground_truth], dtype=np.float32)
+            filters = [{
+                "direction_of_wave": {"$eq": item["Direction of Wave"].strip().capitalize()},
+                "type_of_bottom": {"$eq": item["Type of Bottom"].strip().capitalize()},
+            } for item in ground_truth]
+        else:
+            embeddings = FakeEmbeddings()
+            reference_dir = os.path.join(workdir, "float32")
+            build_catalog(reference_dir, args.spots, embeddings, args.seed)
+            catalog = SpotCatalog(reference_dir)
+            # Queries near a random spot, half of them with the retriever's direction/bottom filter
+            rng = random.Random(args.seed)
+            noise = np.random.default_rng(args.seed).standard_normal((args.queries, catalog.embeddings.shape[1]))
+            queries = np.asarray(catalog.embeddings[[rng.randrange(len(catalog)) for _ in range(args.queries)]])
+            queries = queries + noise * 0.8 / np.sqrt(queries.shape[1])
+            filters = [
+                {"direction_of_wave": {"$eq": rng.choice(DIRECTIONS)}, "type_of_bottom": {"$eq": rng.choice(BOTTOMS)}}
+                if i % 2 else None
+                for i in range(args.queries)
+            ]
+
+        ids, metadata = catalog.ids, list(catalog.metadata_view)
+        vectors = np.asarray(catalog.embeddings, dtype=np.float32)
+        chunks = None
+        reference = LocalVectorIndex(reference_dir)
+        reference_ids, _ = run_queries(reference, queries, filters, args.top_k)
+
+        results = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "variants": {}}
+        for name in args.variants:
+            dtype, rescore, with_chunks = VARIANTS[name]
+            if name == "float32":
+                path = reference_dir
+            else:
+                if with_chunks and chunks is None:
+                    chunks = (text_chunks([meta["spot_description"] for meta in metadata], embeddings)
+                              if args.reference else synthetic_chunks(vectors, args.chunks_per_spot, args.seed))
+                chunk_vectors, chunk_rows = chunks if with_chunks else (None, None)
+                path = os.path.join(workdir, name)
+                LocalVectorIndex.save(path, ids, vectors, metadata, dtype,
+                                      chunk_vectors=chunk_vectors, chunk_rows=chunk_rows, rescore=rescore)
+            index = LocalVectorIndex(path)
+            run_queries(index, queries[:5], filters[:5], args.top_k)  # warm the memory map
+            found, latencies = run_queries(index, queries, filters, args.top_k)
+            m = {
+                "scan_bytes": index.scan_bytes,
+                "disk_bytes": directory_bytes(path),
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p95_ms": float(np.percentile(latencies, 95) * 1000),
+                f"recall@{args.top_k}": recall(reference_ids, found),
+            }
+            results["variants"][name] = m
+            print(f"{name:<16} scan {m['scan_bytes'] / 2**20:8.2f} MiB  disk {m['disk_bytes'] / 2**20:8.2f} MiB  "
+                  f"p50 {m['p50_ms']:7.2f} ms  p95 {m['p95_ms']:7.2f} ms  "
+                  f"recall@{args.top_k} {m[f'recall@{args.top_k}']:.3f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+import resilience
+from lexical_index import BM25Index
+from resilience import deadline_scope
+from search import SurfSpotRetriever
+from fakes import Faults, FakeEmbeddings, FakePineconeIndex, build_catalog, DIRECTIONS, BOTTOMS, WORDS
+from run_benchmark import percentiles
+
+# Retrieval latency and success rate under injected faults, with the resilience layer on and off.
+# Run with: PYTHONPATH=src:benchmarks python benchmarks/bench_resilience.py --output benchmarks/results/resilience.json
+
+SCENARIOS = {
+    "healthy": {},
+    "slow_tail": {"slow_rate": 0.05},
+    "errors": {"error_rate": 0.1},
+    "outage": {"outage": True},
+}
+
+def run_scenario(index_dir: str, lexical: BM25Index, scenario: Dict, enabled: bool, args) -> Dict[str, float]:
+    # Fresh dependencies per run: no breaker state or last-known-good results carried over
+    resilience._dependencies.clear()
+    embed_faults = Faults(slow_delay=args.slow_delay, seed=args.seed, **scenario)
+    index_faults = Faults(slow_delay=args.slow_delay, seed=args.seed + 1, **scenario)
+    retriever = SurfSpotRetriever(
+        "local",
+        embeddings=FakeEmbeddings(args.embed_delay, faults=embed_faults),
+        index=FakePineconeIndex(index_dir, args.index_delay, faults=index_faults),
+        lexical_index=lexical,
+        mode=args.mode,
+    )
+    for name in ("embeddings", "vector_index"):
+        resilience.get_dependency(name).enabled = enabled
+    query_rng = random.Random(args.seed)
+    queries = [" ".join(query_rng.choice(WORDS) for _ in range(5)) for _ in range(args.requests)]
+
+    def call(i):
+        rng = random.Random(args.seed + i)
+        start = time.perf_counter()
+        try:
+            with deadline_scope(args.deadline):
+                retriever.retrieve_spots(queries[i], rng.choice(DIRECTIONS), rng.choice(BOTTOMS), 3)
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        outcomes = list(executor.map(call, range(args.requests)))
+    summary = percentiles([latency for latency, _ in outcomes], time.perf_counter() - start)
+    summary["success_rate"] = sum(ok for _, ok in outcomes) / len(outcomes)
+    summary["dependencies"] = resilience.dependency_stats()
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval under injected faults.")
+    parser.add_argument("--spots", type=int, default=500, help="Synthetic catalog size")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument("--embed-delay", type=float, default=0.05)
+    parser.add_argument("--index-delay", type=float, default=0.03)
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Stall of a slow-tail call")
+    parser.add_argument("--deadline", type=float, default=3.0, help="Per-request retrieval deadline")
+    parser.add_argument("--mode", choices=["vector", "hybrid"], default="vector",
+                        help="hybrid also falls back to keyword results when the vector path fails")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    results = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "scenarios": {}}
+    with tempfile.TemporaryDirectory() as index_dir:
+        catalog = build_catalog(index_dir, args.spots, FakeEmbeddings(), args.seed)
+        lexical = BM25Index.build([str(i) for i in range(len(catalog))], catalog)
+        for name, scenario in SCENARIOS.items():
+            for enabled in (False, True):
+                label = f"{name}/{'on' if enabled else 'off'}"
+                m = run_scenario(index_dir, lexical, scenario, enabled, args)
+                results["scenarios"][label] = m
+                print(f"{label:<16} p50 {m['p50_ms']:8.2f} ms  p95 {m['p95_ms']:8.2f} ms  "
+                      f"p99 {m['p99_ms']:8.2f} ms  success {m['success_rate'] * 100:6.1f}%")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
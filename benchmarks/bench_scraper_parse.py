@@ -0,0 +1,81 @@
+import argparse
+import glob
+import json
+import os
+import time
+from scraper import parse_surf_spot_page, SPOT_PAGE_STRAINER
+
+# Compare strained parsing against the full-tree parse over a directory of spot pages. The default
+# corpus in benchmarks/data/spot_pages is synthetic: Elementor-style pages built from the widget
+# markup the scraper reads, with page chrome around it and a few pages missing widgets. Its
+# golden.json was produced by the parser before strainers were added.
+# Run with: PYTHONPATH=src:scripts python benchmarks/bench_scraper_parse.py [pages_dir]
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "spot_pages")
+
+def load_pages(pages_dir):
+    paths = sorted(glob.glob(os.path.join(pages_dir, "**", "*.html"), recursive=True))
+    pages = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            pages[os.path.relpath(path, pages_dir)] = f.read()
+    return pages
+
+def time_parser(pages, parse_only, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in pages.values():
+            parse_surf_spot_page(content, parse_only=parse_only)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def write_golden(pages, golden_path):
+    """Regenerate the golden file from the full-tree parse, only when the output format changes"""
+    full = {name: parse_surf_spot_page(content, parse_only=None) for name, content in pages.items()}
+    with open(golden_path, "w", encoding="utf-8") as f:
+        json.dump(full, f, ensure_ascii=False, indent=4, sort_keys=True)
+        f.write("\n")
+    print(f"Golden file written to {golden_path}")
+
+def check_golden(pages, golden_path):
+    """The strained parser must reproduce the golden output for every page"""
+    if not os.path.exists(golden_path):
+        raise SystemExit(f"Golden file {golden_path} not found (create it with --update-golden)")
+    with open(golden_path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    mismatches = [
+        name for name, content in pages.items()
+        if name not in golden or json.loads(json.dumps(parse_surf_spot_page(content))) != golden[name]
+    ]
+    for name in mismatches:
+        print(f"  Mismatch: {name}")
+    print(f"{len(pages) - len(mismatches)}/{len(pages)} pages match the golden output.")
+    return not mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark surf spot page parsing.")
+    parser.add_argument("pages_dir", nargs="?", default=DEFAULT_PAGES_DIR,
+                        help="Directory of spot pages (*.html, default: the committed synthetic corpus)")
+    parser.add_argument("--golden", default=None,
+                        help="Golden output file (default: <pages_dir>/golden.json)")
+    parser.add_argument("--update-golden", action="store_true",
+                        help="Rewrite the golden file from the full-tree parse instead of checking it")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        raise SystemExit(f"No .html pages found in {args.pages_dir}")
+
+    golden_path = args.golden or os.path.join(args.pages_dir, "golden.json")
+    if args.update_golden:
+        write_golden(pages, golden_path)
+    ok = check_golden(pages, golden_path)
+    full_time = time_parser(pages, None, args.repeat)
+    strained_time = time_parser(pages, SPOT_PAGE_STRAINER, args.repeat)
+    print(f"Full tree: {full_time * 1000 / len(pages):.2f} ms/page")
+    print(f"Strained:  {strained_time * 1000 / len(pages):.2f} ms/page")
+    print(f"Speedup:   {full_time / strained_time:.2f}x over {len(pages)} pages")
+    if not ok:
+        raise SystemExit(1)
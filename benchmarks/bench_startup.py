@@ -0,0 +1,119 @@
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Import cost of the service entry points, from `python -X importtime`, checked against a tracked budget.
+# Run with: python benchmarks/bench_startup.py            (exits 1 if over budget)
+#           python benchmarks/bench_startup.py --update   (after an intended change)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "startup_budget.json")
+MODULES = ["pipeline", "services", "api", "batch", "precompute", "app"]
+# Run before importing the module and not counted: `streamlit run` has loaded Streamlit before app.py
+# starts. Where it is not installed, a stub with the decorator app.py uses at import stands in for it.
+PRELUDES = {
+    "app": (
+        "import sys, types\n"
+        "try:\n"
+        "    import streamlit\n"
+        "except ImportError:\n"
+        "    streamlit = sys.modules['streamlit'] = types.ModuleType('streamlit')\n"
+        "    streamlit.cache_resource = lambda fn: fn\n"
+    ),
+}
+# Provider SDKs are imported when a client is first built, never at startup.
+# (dotenv is left out: config imports it whenever there is a .env file to load.)
+LAZY_PACKAGES = ["pinecone", "langchain_google_genai", "langchain_core", "openai", "tiktoken", "requests"]
+
+def import_times(module: str) -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    Cumulative import time of `module` in milliseconds, the cumulative time of each of its
+    direct imports, and every module it loaded
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.join(ROOT, "src"), env.get("PYTHONPATH")]))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PRELUDES.get(module, "") + f"import {module}"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    # Lines are "import time: self | cumulative | <2 spaces per nesting level>name", children
+    # before their parent; everything after the interpreter's own startup imports belongs to `module`
+    children: Dict[str, float] = {}
+    loaded: List[str] = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, label = line[len("import time:"):].split("|")
+        name = label.strip()
+        depth = (len(label) - len(label.lstrip()) - 1) // 2
+        milliseconds = int(cumulative) / 1000
+        if depth == 0:
+            if name == module:
+                return milliseconds, children, loaded
+            children, loaded = {}, []
+            continue
+        loaded.append(name)
+        if depth == 1:
+            children[name] = milliseconds
+    raise RuntimeError(f"{module} did not appear in the import trace")
+
+def measure(module: str, repeat: int) -> Dict:
+    runs = [import_times(module) for _ in range(repeat)]
+    _, children, loaded = runs[-1]
+    return {
+        "median_ms": statistics.median(total for total, _, _ in runs),
+        "slowest_imports": dict(sorted(children.items(), key=lambda item: -item[1])[:5]),
+        "eager_sdks": sorted({name.split(".")[0] for name in loaded} & set(LAZY_PACKAGES)),
+    }
+
+def check(results: Dict[str, Dict], budget: Dict[str, float]) -> List[str]:
+    problems = []
+    for module, result in results.items():
+        if result["eager_sdks"]:
+            problems.append(f"{module} imports {', '.join(result['eager_sdks'])} at startup")
+        limit = budget.get(module)
+        if limit is not None and result["median_ms"] > limit:
+            problems.append(f"{module} takes {result['median_ms']:.1f} ms to import (budget {limit} ms)")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure and budget the import time of the entry points.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per module; the median is reported")
+    parser.add_argument("--update", action="store_true", help="Rewrite the budget with headroom over this run")
+    parser.add_argument("--headroom", type=float, default=1.5, help="Budget = median x headroom on --update")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = measure(module, args.repeat)
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in results[module]["slowest_imports"].items())
+        print(f"{module:<12} {results[module]['median_ms']:8.1f} ms   slowest: {slowest}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
+
+    budget = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH, "r", encoding="utf-8") as f:
+            budget = json.load(f)
+    if args.update:
+        for module, result in results.items():
+            budget[module] = math.ceil(result["median_ms"] * args.headroom / 10) * 10
+        with open(BUDGET_PATH, "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=4)
+        print(f"Budget saved to {BUDGET_PATH}")
+
+    problems = check(results, budget)
+    for problem in problems:
+        print(f"OVER BUDGET: {problem}")
+    sys.exit(1 if problems else 0)
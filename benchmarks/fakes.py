@@ -0,0 +1,244 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional
+import numpy as np
+from vector_index import LocalVectorIndex
+
+# Deterministic local stand-ins for Google embeddings, Pinecone, the OpenAI Responses API and IPMA.
+# Each accepts a delay so benchmarks can model network latency without calling any real service,
+# and optional Faults to model errors, slow tails and outages.
+
+DIMENSION = 768
+DIRECTIONS = ["Right", "Left", "Left and right"]
+BOTTOMS = ["Reef", "Sand", "Sand with rocks"]
+WORDS = ["reef", "sand", "right-hander", "left-hander", "beginner", "intermediate", "advanced",
+         "barrel", "point", "beach", "low tide", "high tide", "crowded", "quiet", "powerful",
+         "mellow", "long", "short", "consistent", "swell", "offshore", "rocks", "peak", "fun"]
+
+def _sleep(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+class Faults:
+    """
+    Seeded fault injection: each call fails with probability error_rate, or stalls for
+    slow_delay with probability slow_rate; `outage` fails every call until cleared.
+    """
+    def __init__(self, error_rate: float = 0.0, slow_rate: float = 0.0, slow_delay: float = 1.0,
+                 outage: bool = False, seed: int = 0):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.outage = outage
+        self.errors = 0
+        self.slow = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self) -> None:
+        with self._lock:
+            draw = self._rng.random()
+            failing = self.outage or draw < self.error_rate
+            slow = not failing and draw < self.error_rate + self.slow_rate
+            self.errors += failing
+            self.slow += slow
+        if failing:
+            raise ConnectionError("injected fault")
+        if slow:
+            time.sleep(self.slow_delay)
+
+def _inject(faults: Optional[Faults]) -> None:
+    if faults is not None:
+        faults.apply()
+
+class FakeEmbeddings:
+    """Hash-seeded unit vectors: the same text always embeds to the same vector"""
+    def __init__(self, delay: float = 0.0, dimension: int = DIMENSION, faults: Optional[Faults] = None):
+        self.delay = delay
+        self.dimension = dimension
+        self.faults = faults
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        _sleep(self.delay)
+        _inject(self.faults)
+        return self._vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        _sleep(self.delay)
+        return [self._vector(text) for text in texts]
+
+class FakePineconeIndex:
+    """In-memory index with Pinecone's query signature and ``$eq``/range filter syntax"""
+    def __init__(self, path: str, delay: float = 0.0, faults: Optional[Faults] = None):
+        self.local = LocalVectorIndex(path)
+        self.delay = delay
+        self.faults = faults
+
+    def query(self, vector, top_k=3, filter=None, include_metadata=True):
+        _sleep(self.delay)
+        _inject(self.faults)
+        return self.local.query(vector=vector, top_k=top_k, filter=filter, include_metadata=include_metadata)
+
+    def describe_index_stats(self):
+        return {"total_vector_count": len(self.local.ids)}
+
+def build_catalog(path: str, n_spots: int, embeddings: FakeEmbeddings, seed: int = 0) -> List[Dict[str, Any]]:
+    """Write a synthetic spot catalog as a local index and return its metadata"""
+    rng = random.Random(seed)
+    ids, texts, metadata = [], [], []
+    for i in range(n_spots):
+        description = " ".join(rng.choice(WORDS) for _ in range(60))
+        level_min = rng.randrange(0, 6)
+        meta = {
+            "name": f"spot-{i}",
+            "direction_of_wave": rng.choice(DIRECTIONS),
+            "type_of_bottom": rng.choice(BOTTOMS),
+            "spot_description": description,
+            "surf_level_min": level_min,
+            "surf_level_max": min(7, level_min + rng.randrange(0, 3)),
+            "crowd_score": rng.randrange(1, 6),
+            "best_swell_direction": ", ".join(rng.sample(["N", "NW", "W", "SW", "S"], rng.randrange(1, 4))),
+            "swell_size": f"{rng.choice([0.5, 1, 1.5])}-{rng.choice([2, 3, 4])}m",
+        }
+        ids.append(str(i))
+        texts.append(description)
+        metadata.append(meta)
+    LocalVectorIndex.save(path, ids, embeddings.embed_documents(texts), metadata)
+    return metadata
+
+class _FakeResponses:
+    def __init__(self, delay: float, tokens: int, token_delay: float, faults: Optional[Faults]):
+        self.delay = delay
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.faults = faults
+        self.calls = 0
+
+    def _text(self, kwargs) -> List[str]:
+        seed = hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).digest()
+        rng = random.Random(seed)
+        return [rng.choice(WORDS) + " " for _ in range(self.tokens)]
+
+    @staticmethod
+    def _usage(words: List[str]) -> SimpleNamespace:
+        return SimpleNamespace(input_tokens=0, output_tokens=len(words), total_tokens=len(words))
+
+    def _stream(self, words: List[str]):
+        _sleep(self.delay)
+        yield SimpleNamespace(type="response.created")
+        for word in words:
+            _sleep(self.token_delay)
+            yield SimpleNamespace(type="response.output_text.delta", delta=word)
+        yield SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=self._usage(words)))
+
+    def create(self, stream: bool = False, **kwargs):
+        self.calls += 1
+        _inject(self.faults)
+        words = self._text(kwargs)
+        if stream:
+            return self._stream(words)
+        _sleep(self.delay + self.token_delay * len(words))
+        content = [SimpleNamespace(type="output_text", text="".join(words))]
+        return SimpleNamespace(
+            output=[SimpleNamespace(type="message", content=content)],
+            usage=self._usage(words)
+        )
+
+class FakeOpenAI:
+    """Responses API stand-in with configurable time-to-first-token and per-token delay"""
+    def __init__(self, delay: float = 0.0, tokens: int = 400, token_delay: float = 0.0,
+                 faults: Optional[Faults] = None):
+        self.responses = _FakeResponses(delay, tokens, token_delay, faults)
+        self.models = SimpleNamespace(list=lambda: [])
+
+def ipma_payload(day: int, n_regions: int = 12) -> Dict[str, Any]:
+    """
+    Forecast file in the hp-daily-sea-forecast layout, including the Lisbon coast region.
+    Regions have no coordinates: benchmark spots have none either, so all use the Lisbon coast.
+    """
+    rng = random.Random(day)
+    data = []
+    for i in range(n_regions):
+        global_id = 1111026 if i == 0 else 1000000 + i
+        data.append({
+            "globalIdLocal": global_id,
+            "waveHighMin": f"{rng.uniform(0.5, 1.5):.1f}",
+            "waveHighMax": f"{rng.uniform(1.5, 3.0):.1f}",
+            "wavePeriodMin": f"{rng.uniform(6, 9):.1f}",
+            "wavePeriodMax": f"{rng.uniform(9, 14):.1f}",
+            "predWaveDir": rng.choice(["NW", "W", "N"]),
+            "sstMin": f"{rng.uniform(15, 17):.1f}",
+            "sstMax": f"{rng.uniform(17, 19):.1f}",
+        })
+    return {"forecastDate": f"2026-10-{16 + day:02d}", "dataUpdate": "2026-10-16T00:00:00", "data": data}
+
+class FakeIPMAServer:
+    """Local HTTP server serving forecast files with ETag support; injected faults answer 503"""
+    def __init__(self, delay: float = 0.0, payloads: Optional[Dict[int, Dict]] = None,
+                 faults: Optional[Faults] = None):
+        self.delay = delay
+        self.faults = faults
+        self.requests = 0
+        payloads = payloads or {day: ipma_payload(day) for day in (1, 2)}
+        self.bodies = {day: json.dumps(payload).encode("utf-8") for day, payload in payloads.items()}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                _sleep(server.delay)
+                try:
+                    _inject(server.faults)
+                except ConnectionError:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                day = next((d for d in server.bodies if f"day{d}." in self.path), None)
+                if day is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = server.bodies[day]
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        port = self.httpd.server_address[1]
+        return f"http://127.0.0.1:{port}/open-data/forecast/oceanography/daily/hp-daily-sea-forecast-day{{idDay}}.json"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
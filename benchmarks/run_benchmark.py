@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+import numpy as np
+import forecast
+import report_cache
+from cache import TwoTierCache
+from embedding_cache import CachedEmbeddings
+from pipeline import SurfReportPipeline
+from services import SurfServices
+from suitability import SpotConditions, SuitabilityEngine
+from fakes import FakeEmbeddings, FakePineconeIndex, FakeOpenAI, FakeIPMAServer, build_catalog, DIRECTIONS, BOTTOMS, WORDS
+
+# Offline latency/throughput benchmark of retrieval, forecast, generation and the full pipeline.
+# Run with: PYTHONPATH=src:benchmarks python benchmarks/run_benchmark.py --output benchmarks/results/local.json
+def percentiles(latencies: List[float], wall_time: float) -> Dict[str, float]:
+    values = np.asarray(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "requests_per_second": len(latencies) / wall_time if wall_time > 0 else 0.0,
+    }
+
+def run_stage(fn: Callable[[random.Random], None], requests: int, users: int, seed: int) -> Dict[str, float]:
+    """Issue `requests` calls from `users` concurrent threads and summarise per-call latency"""
+    def call(i):
+        rng = random.Random(seed + i)
+        start = time.perf_counter()
+        fn(rng)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        latencies = list(executor.map(call, range(requests)))
+    return percentiles(latencies, time.perf_counter() - start)
+
+def compare(results: Dict, baseline: Dict) -> None:
+    print(f"\n{'stage':<14}{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for stage, metrics in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "requests_per_second"):
+            before, after = base[metric], metrics[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{stage:<14}{metric:<22}{before:>12.2f}{after:>12.2f}{change:>9.1f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the surf report pipeline against local fakes.")
+    parser.add_argument("--spots", type=int, default=500, help="Synthetic catalog size")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per stage")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument("--distinct-queries", type=int, default=50,
+                        help="Size of the query pool (controls embedding cache hits)")
+    parser.add_argument("--embed-delay", type=float, default=0.05)
+    parser.add_argument("--index-delay", type=float, default=0.03)
+    parser.add_argument("--ipma-delay", type=float, default=0.08)
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="Time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--report-cache", action="store_true", help="Keep the report cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    embeddings = CachedEmbeddings(FakeEmbeddings(args.embed_delay), "fake-embedding", TwoTierCache(None))
+    if not args.report_cache:
+        # A zero-sized memory tier and no disk tier: every lookup misses
+        report_cache._shared_cache = report_cache.ReportCache(TwoTierCache(None, max_memory_items=0))
+
+    with tempfile.TemporaryDirectory() as index_dir, FakeIPMAServer(args.ipma_delay) as ipma:
+        catalog = build_catalog(index_dir, args.spots, FakeEmbeddings(), args.seed)
+        forecast.BASE_URL = ipma.base_url
+        forecast._default_client.clear()
+
+        services = SurfServices(
+            "local",
+            embeddings=embeddings,
+            index=FakePineconeIndex(index_dir, args.index_delay),
+            openai_client=FakeOpenAI(args.llm_delay, token_delay=args.token_delay),
+            suitability=SuitabilityEngine(SpotConditions.build([str(i) for i in range(len(catalog))], catalog))
+        )
+        pipeline = SurfReportPipeline(services, max_workers=args.users * 2)
+        retriever = services.retriever()
+        query_rng = random.Random(args.seed)
+        queries = [" ".join(query_rng.choice(WORDS) for _ in range(5)) for _ in range(args.distinct_queries)]
+        sample_forecast = forecast.get_weekend_forecast()
+        sample_spots = retriever.retrieve_spots(queries[0], "Right", "Reef", 3)
+
+        # One client without a cache: every request goes to IPMA, as a conditional GET once it has an ETag
+        uncached_client = forecast.ForecastClient(ttl=0, stale_ttl=0)
+
+        def uncached_forecast(rng):
+            uncached_client.fetch_many([1, 2])
+
+        stages = {
+            "retrieval": lambda rng: retriever.retrieve_spots(
+                rng.choice(queries), rng.choice(DIRECTIONS), rng.choice(BOTTOMS), rng.choice([3, 5, 10])
+            ),
+            "forecast": lambda rng: forecast.get_weekend_forecast(),
+            "forecast_cold": uncached_forecast,
+            "generation": lambda rng: services.report_generator(
+                sample_spots, sample_forecast, "gpt-4o", 0.3
+            ).generate_report(rng.choice(queries)),
+            "end_to_end": lambda rng: pipeline.run(
+                rng.choice(queries), rng.choice(DIRECTIONS), rng.choice(BOTTOMS), 3
+            ),
+        }
+
+        results = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "stages": {},
+        }
+        for name, fn in stages.items():
+            results["stages"][name] = run_stage(fn, args.requests, args.users, args.seed)
+            m = results["stages"][name]
+            print(f"{name:<14} p50 {m['p50_ms']:8.2f} ms  p95 {m['p95_ms']:8.2f} ms  "
+                  f"p99 {m['p99_ms']:8.2f} ms  {m['requests_per_second']:8.1f} req/s")
+        uncached_client._executor.shutdown()
+        results["embedding_cache"] = embeddings.stats()
+        results["ipma_requests"] = ipma.requests
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
@@ -0,0 +1,63 @@
+import argparse
+from pinecone import Pinecone
+from config import PINECONE_API_KEY, LOCAL_INDEX_PATH
+from spot_catalog import EMBEDDING_DTYPES
+from vector_index import LocalVectorIndex
+
+DIRECTIONS = ["Right", "Left", "Left and right"]
+BOTTOMS = ["Reef", "Sand", "Sand with rocks"]
+
+# Copy every vector of the Pinecone index to the local NumPy backend
+def export_index(index, path, embedding_dtype="float32"):
+    ids, vectors, metadata = [], [], []
+    for id_batch in index.list():
+        fetched = index.fetch(ids=list(id_batch))
+        for vector_id, vector in fetched.vectors.items():
+            ids.append(vector_id)
+            vectors.append(vector.values)
+            metadata.append(dict(vector.metadata or {}))
+    LocalVectorIndex.save(path, ids, vectors, metadata, embedding_dtype)
+    print(f"Exported {len(ids)} vectors to {path}")
+
+# Replay stored vectors as queries against both backends and compare the rankings
+def verify_index(index, local_index, top_k=5, max_probes=20):
+    probes = local_index.ids[:max_probes]
+    mismatches = 0
+    total = 0
+    for probe_id in probes:
+        vector = index.fetch(ids=[probe_id]).vectors[probe_id].values
+        for direction in DIRECTIONS:
+            for bottom in BOTTOMS:
+                metadata_filter = {
+                    "direction_of_wave": {"$eq": direction},
+                    "type_of_bottom": {"$eq": bottom}
+                }
+                remote = index.query(vector=vector, top_k=top_k,
+                                     filter=metadata_filter, include_metadata=False)
+                local = local_index.query(vector=vector, top_k=top_k,
+                                          filter=metadata_filter, include_metadata=False)
+                remote_ids = [m["id"] for m in remote["matches"]]
+                local_ids = [m["id"] for m in local["matches"]]
+                total += 1
+                if remote_ids != local_ids:
+                    mismatches += 1
+                    print(f"  Mismatch for {probe_id} ({direction}/{bottom}): "
+                          f"pinecone={remote_ids} local={local_ids}")
+    print(f"{total - mismatches}/{total} probe queries returned identical rankings.")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Pinecone index to a local NumPy index.")
+    parser.add_argument("--index-name", default="surfspots")
+    parser.add_argument("--output", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--verify", action="store_true",
+                        help="Compare local and Pinecone rankings after exporting")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", choices=EMBEDDING_DTYPES, default="float32",
+                        help="Storage type of the exported embedding matrix")
+    args = parser.parse_args()
+
+    pinecone_index = Pinecone(api_key=PINECONE_API_KEY).Index(args.index_name)
+    export_index(pinecone_index, args.output, args.dtype)
+    if args.verify:
+        verify_index(pinecone_index, LocalVectorIndex(args.output), top_k=args.top_k)
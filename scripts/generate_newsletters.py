@@ -0,0 +1,33 @@
+import argparse
+import os
+import time
+from batch import BatchReportGenerator, load_profiles
+from pipeline import SurfReportPipeline
+
+# Bulk weekend reports for newsletter subscribers, one generation per distinct prompt.
+# Run with: PYTHONPATH=src python scripts/generate_newsletters.py --profiles data/subscribers.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate weekend surf reports for a file of subscriber profiles.")
+    parser.add_argument("--profiles", required=True,
+                        help="JSON list or JSON Lines of {user_id, query, preferred_direction, preferred_bottom, "
+                             "top_k, generation_model, temperature, skill_level}")
+    parser.add_argument("--output", default="outputs/newsletters.jsonl",
+                        help="One JSON line per subscriber, written as reports complete")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent retrieval/generation calls")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retries per generation on rate limits and server errors")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profiles)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    batch = BatchReportGenerator(
+        SurfReportPipeline(max_workers=args.concurrency * 2),
+        concurrency=args.concurrency,
+        max_retries=args.max_retries
+    )
+
+    start = time.perf_counter()
+    stats = batch.run(profiles, args.output)
+    print(f"{stats['profiles']} subscribers: {stats['retrievals']} retrievals, {stats['generations']} generations, "
+          f"{stats['retries']} retries, {stats['failures']} failures in {time.perf_counter() - start:.1f}s")
+    print(f"Reports written to {args.output}")
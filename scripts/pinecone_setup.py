@@ -1,65 +1,302 @@
+import argparse
+import hashlib
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 from pinecone import Pinecone, ServerlessSpec
-from config import PINECONE_API_KEY, GOOGLE_API_KEY
-
-with open("..data/surf_spots_enriched.json", "r") as file:
-    surf_spots = json.load(file)
-
-spot_data = [
-    {
-        "spot_id": str(index + 1),
-        "name": spot["url"].split("/")[-2],  # Extract name from URL
-        "description": spot["details"]["Spot Description"],
-        "metadata": {
-            "direction_of_wave": spot["details"]["Direction of Wave"],
-            "type_of_bottom": spot["details"]["Type of Bottom"],
+from config import (PINECONE_API_KEY, GOOGLE_API_KEY, EMBEDDING_MODEL, LEXICAL_INDEX_PATH, SPOT_CONDITIONS_PATH,
+                    LOCAL_INDEX_PATH, SPOT_COORDINATES_PATH)
+from embedding_cache import CachedEmbeddings
+from lexical_index import BM25Index
+from spot_catalog import SpotCatalog, EMBEDDING_DTYPES, description_chunks
+from suitability import SpotConditions
+
+# Bump to force a full re-embed when the stored vector/metadata layout changes
+PIPELINE_VERSION = 3
+
+# Index metadata key -> enriched spot detail
+TYPED_FIELDS = {
+    "surf_level_min": "Surf Level Min",
+    "surf_level_max": "Surf Level Max",
+    "crowd_score": "Crowd Score",
+}
+
+# Index metadata key -> scraped condition text, parsed into numeric arrays by suitability.py
+CONDITION_FIELDS = {
+    "best_swell_direction": "Best Swell Direction",
+    "swell_size": "Swell Size",
+}
+
+def load_spot_data(input_file):
+    if SpotCatalog.exists(input_file):
+        return load_catalog_spots(input_file)
+    with open(input_file, "r", encoding="utf-8") as file:
+        surf_spots = json.load(file)
+
+    return [
+        {
+            # The URL slug is stable across scrapes, unlike the list position
+            "spot_id": spot["url"].rstrip("/").split("/")[-1],
+            "name": spot["url"].split("/")[-2],  # Extract name from URL
+            "description": spot["details"]["Spot Description"],
+            "metadata": {
+                "direction_of_wave": spot["details"]["Direction of Wave"],
+                "type_of_bottom": spot["details"]["Type of Bottom"],
+                # Typed fields computed by process_surfspots.py (absent for unrated spots)
+                **{
+                    key: spot["details"][field]
+                    for key, field in TYPED_FIELDS.items()
+                    if spot["details"].get(field) is not None
+                },
+                **{
+                    key: spot["details"][field]
+                    for key, field in CONDITION_FIELDS.items()
+                    if spot["details"].get(field) not in (None, "Not available")
+                }
+            }
         }
+        for spot in surf_spots
+    ]
+
+def load_catalog_spots(path):
+    """Spots from a catalog written by an earlier run, in the load_spot_data layout"""
+    catalog = SpotCatalog(path)
+    spots = []
+    for spot_id, meta in zip(catalog.ids, catalog.metadata_view):
+        meta = dict(meta)
+        spots.append({
+            "spot_id": spot_id,
+            "name": meta.pop("name"),
+            "description": meta.pop("spot_description"),
+            "metadata": meta
+        })
+    return spots
+
+def attach_coordinates(spot_data, path):
+    """Add latitude/longitude metadata from a {spot id or name: [latitude, longitude]} file"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as file:
+        coordinates = json.load(file)
+    located = 0
+    for spot in spot_data:
+        point = coordinates.get(spot["spot_id"], coordinates.get(spot["name"]))
+        if point is not None:
+            spot["metadata"]["latitude"], spot["metadata"]["longitude"] = float(point[0]), float(point[1])
+            located += 1
+    return located
+
+def build_metadata(spot):
+    return {
+        "name": spot["name"],  # Spot name
+        **spot["metadata"],
+        "spot_description": spot["description"]
     }
-    for index, spot in enumerate(surf_spots)
-]
-
-pinecone = Pinecone(
-    api_key=PINECONE_API_KEY
-)
-
-index_name = "surfspots"
-
-if index_name not in pinecone.list_indexes().names():
-    pinecone.create_index(
-        name=index_name,
-        dimension=768,  # dimension for embedding model
-        metric="cosine",  # cosine similarity for semantic search
-        spec=ServerlessSpec(
-            cloud="aws",  
-            region="us-east-1"  
-        )
+
+def content_hash(spot):
+    """Fingerprint everything that ends up in the index for this spot"""
+    payload = json.dumps(
+        {"version": PIPELINE_VERSION, "model": EMBEDDING_MODEL, "metadata": build_metadata(spot)},
+        sort_keys=True, ensure_ascii=False
     )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-# Connect to the index
-index = pinecone.Index(index_name)
+# Checkpoint handling: {"index": name, "spots": {spot_id: content_hash}}
+def load_checkpoint(path, index_name):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("index") == index_name:
+            return checkpoint
+    return {"index": index_name, "spots": {}}
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+def save_checkpoint(path, checkpoint):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file, indent=4)
+    os.replace(tmp_path, path)  # atomic, so an interrupted run never corrupts it
 
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=GOOGLE_API_KEY
-)
+def plan_changes(spot_data, checkpoint, remote_ids=None):
+    """Return (spots to upsert, ids to delete) relative to the last indexed state"""
+    known = checkpoint["spots"]
+    current_ids = {spot["spot_id"] for spot in spot_data}
+    changed = [spot for spot in spot_data if known.get(spot["spot_id"]) != content_hash(spot)]
+    stale = set(known) - current_ids
+    if remote_ids is not None:
+        stale |= set(remote_ids) - current_ids
+    return changed, sorted(stale)
 
-for spot in spot_data:
-    print(f"Embedding and storing: {spot['name']}")
-    vector = embeddings.embed_query(spot["description"])  
-    index.upsert(
-        vectors=[{
-            "id": spot["spot_id"],  # Unique ID
-            "values": vector,       # Embedding vector
-            "metadata": {
-                "name": spot["name"],  # Spot name
-                "direction_of_wave": spot["metadata"]["direction_of_wave"],
-                "type_of_bottom": spot["metadata"]["type_of_bottom"],
-                "spot_description": spot["description"]  
-            }
-        }]
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def previous_vectors(path, with_chunks):
+    """
+    {(spot_id, content_hash): (vector, chunk vectors)} from the catalog at `path`, copied into
+    memory so the rewrite does not read the generation it replaces. Empty if it lacks hashes or
+    full-precision vectors.
+    """
+    if not path or not SpotCatalog.exists(path):
+        return {}
+    catalog = SpotCatalog(path)
+    hashes = catalog.content_hashes()
+    matrix = catalog.embedding_matrix()
+    chunks = catalog.chunk_matrix() if with_chunks else None
+    if hashes is None or matrix is None or matrix.exact is None:
+        return {}
+    if with_chunks and (chunks is None or chunks[0].exact is None):
+        return {}
+    if with_chunks:
+        offsets = np.searchsorted(chunks[1], np.arange(len(catalog) + 1))
+    previous = {}
+    for row, key in enumerate(zip(catalog.ids, hashes)):
+        chunk_vectors = np.array(chunks[0].exact[offsets[row]:offsets[row + 1]]) if with_chunks else None
+        previous[key] = (np.array(matrix.exact[row]), chunk_vectors)
+    return previous
+
+def catalog_vectors(spot_data, embeddings, previous_path, with_chunks):
+    """
+    Vectors for every spot, plus chunk vectors and the spot row of each chunk when with_chunks.
+    Spots unchanged since the catalog at previous_path reuse its vectors; only the rest are embedded,
+    so the catalog costs no more than the incremental ingest even without the embedding cache.
+    """
+    previous = previous_vectors(previous_path, with_chunks)
+    found = [previous.get((spot["spot_id"], content_hash(spot))) for spot in spot_data]
+    missing = [row for row, entry in enumerate(found) if entry is None]
+    print(f"Catalog: reusing {len(spot_data) - len(missing)} vectors, embedding {len(missing)} spots.")
+
+    vectors = [entry[0] if entry is not None else None for entry in found]
+    for row, vector in zip(missing, embeddings.embed_documents([spot_data[row]["description"] for row in missing])):
+        vectors[row] = vector
+    if not with_chunks:
+        return vectors, None, None
+
+    spot_chunks = [entry[1] if entry is not None else None for entry in found]
+    texts = {row: description_chunks(spot_data[row]["description"]) for row in missing}
+    embedded = iter(embeddings.embed_documents([text for row in missing for text in texts[row]]))
+    for row in missing:
+        spot_chunks[row] = [next(embedded) for _ in texts[row]]
+    chunk_vectors = [vector for chunks in spot_chunks for vector in chunks]
+    chunk_rows = [row for row, chunks in enumerate(spot_chunks) for _ in range(len(chunks))]
+    return vectors, chunk_vectors, chunk_rows
+
+def get_or_create_index(pinecone, index_name):
+    if index_name not in pinecone.list_indexes().names():
+        pinecone.create_index(
+            name=index_name,
+            dimension=768,  # dimension for embedding model
+            metric="cosine",  # cosine similarity for semantic search
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
+        )
+    return pinecone.Index(index_name)
+
+def ingest(spot_data, index, embeddings, checkpoint, checkpoint_path,
+           batch_size=50, concurrency=4, full_sync=False):
+    remote_ids = None
+    if full_sync or not checkpoint["spots"]:
+        # No history (or explicitly requested): reconcile against what is actually stored
+        remote_ids = [vector_id for batch in index.list() for vector_id in batch]
+
+    changed, stale = plan_changes(spot_data, checkpoint, remote_ids)
+    print(f"{len(spot_data)} spots: {len(changed)} new or changed, {len(stale)} to delete.")
+
+    lock = threading.Lock()
+
+    def process_chunk(chunk):
+        vectors = embeddings.embed_documents([spot["description"] for spot in chunk])
+        index.upsert(vectors=[
+            {"id": spot["spot_id"], "values": vector, "metadata": build_metadata(spot)}
+            for spot, vector in zip(chunk, vectors)
+        ])
+        with lock:
+            for spot in chunk:
+                checkpoint["spots"][spot["spot_id"]] = content_hash(spot)
+            save_checkpoint(checkpoint_path, checkpoint)
+        return len(chunk)
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(process_chunk, chunk) for chunk in chunked(changed, batch_size)]
+        for future in as_completed(futures):
+            done += future.result()
+            print(f"Embedded and stored {done}/{len(changed)} spots")
+
+    for id_batch in chunked(stale, 1000):
+        index.delete(ids=id_batch)
+        for spot_id in id_batch:
+            checkpoint["spots"].pop(spot_id, None)
+        save_checkpoint(checkpoint_path, checkpoint)
+    if stale:
+        print(f"Deleted {len(stale)} spots that no longer exist.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally embed surf spots into Pinecone.")
+    parser.add_argument("--input", default="data/surf_spots_enriched.json",
+                        help="Enriched spots JSON, or a spot catalog directory")
+    parser.add_argument("--index-name", default="surfspots")
+    parser.add_argument("--checkpoint", default="data/ingest_checkpoint.json")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="Spots per embed_documents call and per upsert request")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of chunks in flight")
+    parser.add_argument("--full-sync", action="store_true",
+                        help="Also delete index entries unknown to the current catalog")
+    parser.add_argument("--lexical-index", default=LEXICAL_INDEX_PATH,
+                        help="Where to write the BM25 index used by hybrid retrieval")
+    parser.add_argument("--conditions", default=SPOT_CONDITIONS_PATH,
+                        help="Where to write the swell arrays used for forecast reranking")
+    parser.add_argument("--catalog", default=LOCAL_INDEX_PATH,
+                        help="Where to write the spot catalog read by the local backend ('' to skip)")
+    parser.add_argument("--catalog-dtype", choices=EMBEDDING_DTYPES, default="float32",
+                        help="Storage type of the catalog's embedding matrix")
+    parser.add_argument("--chunks", action="store_true",
+                        help="Experimental: also embed description chunks; local search scores each spot by its "
+                             "best chunk (rankings differ from single-vector search, see the README)")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Also store a float32 copy to rescore candidates of a float16/int8 catalog "
+                             "(makes the catalog larger than a float32 one)")
+    parser.add_argument("--coordinates", default=SPOT_COORDINATES_PATH,
+                        help="{spot id or name: [latitude, longitude]} JSON mapping spots to forecast regions")
+    args = parser.parse_args()
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=GOOGLE_API_KEY
+        ),
+        EMBEDDING_MODEL
     )
+    index = get_or_create_index(Pinecone(api_key=PINECONE_API_KEY), args.index_name)
+    checkpoint = load_checkpoint(args.checkpoint, args.index_name)
+
+    spot_data = load_spot_data(args.input)
+    print(f"Coordinates found for {attach_coordinates(spot_data, args.coordinates)}/{len(spot_data)} spots.")
+    ingest(spot_data, index, embeddings, checkpoint, args.checkpoint,
+           batch_size=args.batch_size, concurrency=args.concurrency, full_sync=args.full_sync)
+
+    # The local indexes are rebuilt in full: they take milliseconds
+    spot_ids = [spot["spot_id"] for spot in spot_data]
+    spot_metadata = [build_metadata(spot) for spot in spot_data]
+    BM25Index.build(spot_ids, spot_metadata).save(args.lexical_index)
+    print(f"Lexical index written to {args.lexical_index}")
+    SpotConditions.build(spot_ids, spot_metadata).save(args.conditions)
+    print(f"Spot conditions written to {args.conditions}")
+    if args.catalog and os.path.abspath(args.catalog) != os.path.abspath(args.input):
+        vectors, chunk_vectors, chunk_rows = catalog_vectors(spot_data, embeddings, args.catalog, args.chunks)
+        SpotCatalog.write(args.catalog, spot_ids, spot_metadata, vectors, args.catalog_dtype,
+                          chunk_vectors=chunk_vectors, chunk_rows=chunk_rows, rescore=args.rescore,
+                          content_hashes=[content_hash(spot) for spot in spot_data])
+        print(f"Spot catalog written to {args.catalog}")
 
-print("All spot descriptions embedded and stored.")
\ No newline at end of file
+    print("All spot descriptions embedded and stored.")
+    print(f"Embedding cache: {embeddings.stats()}")
@@ -1,4 +1,5 @@
 import json
+from spot_attributes import surf_level_range
 
 # Transformation Functions
 def describe_star_ratings(star_ratings):
@@ -122,6 +123,13 @@ def transform_and_enrich_surf_spots(input_file, output_file):
         details["Star Ratings Description"] = describe_star_ratings(details["Star Ratings"])
         details["Surf Level Description"] = describe_surf_level(details["Surf Level Box Colors"])
         details["Tide Description"] = describe_tide(details["Best Tide Box Colors"])
+
+        # Typed fields stored as filterable index metadata, so nothing is re-parsed at query time
+        level_range = surf_level_range(details["Surf Level Box Colors"])
+        if level_range:
+            details["Surf Level Min"], details["Surf Level Max"] = level_range
+        star_ratings = details["Star Ratings"]
+        details["Crowd Score"] = star_ratings.get("Crowd Factor", 0) if isinstance(star_ratings, dict) else 0
         
         # Enrich the description
         enrich_spot_description(spot)
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+from itertools import product
+import pandas as pd
+from services import get_services
+from forecast import get_weekend_forecast
+
+# Grid evaluation of retrieval + generation, replacing the sequential loop in notebooks/eval.ipynb.
+# Run with: PYTHONPATH=src python scripts/run_eval.py --ground-truth notebooks/ground_truth_rag_surf.json
+def config_key(model, temperature, top_k):
+    return f"{model}|{temperature}|{top_k}"
+
+def load_rows(path):
+    """Checkpointed generations: {(config key, query index): row}"""
+    rows = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    rows[(row["config"], row["query_index"])] = row
+    return rows
+
+def retrieve_all(ground_truth, top_ks, concurrency):
+    """
+    {top_k: spots per query}, one retrieval per query and top_k: whether hybrid retrieval takes
+    the keyword fast path depends on top_k, so a smaller top_k is not a prefix of a larger one
+    """
+    services = get_services()
+    retriever = services.retriever()
+
+    async def retrieve(item, top_k, semaphore):
+        async with semaphore:
+            return await asyncio.to_thread(
+                retriever.retrieve_spots,
+                item["Query"], item["Direction of Wave"], item["Type of Bottom"], top_k
+            )
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        top_ks_sorted = sorted(set(top_ks))
+        results = await asyncio.gather(*(
+            retrieve(item, top_k, semaphore) for top_k in top_ks_sorted for item in ground_truth
+        ))
+        n = len(ground_truth)
+        return {top_k: results[i * n:(i + 1) * n] for i, top_k in enumerate(top_ks_sorted)}
+
+    return asyncio.run(run())
+
+def generate_all(ground_truth, spots_per_query, forecast, configs, rows, rows_path, concurrency):
+    """Generate every missing (config, query) row with bounded concurrency, appending as they finish"""
+    services = get_services()
+    pending = [
+        (config, index)
+        for config in configs
+        for index in range(len(ground_truth))
+        if (config_key(*config), index) not in rows
+    ]
+    print(f"{len(rows)} rows checkpointed, {len(pending)} to generate.")
+
+    async def generate(config, index, semaphore, checkpoint):
+        model, temperature, top_k = config
+        item = ground_truth[index]
+        spots = spots_per_query[top_k][index]
+        generator = services.report_generator(spots, forecast, model, temperature)
+        async with semaphore:
+            answer = await asyncio.to_thread(generator.generate_report, item["Query"])
+        row = {
+            "config": config_key(*config),
+            "query_index": index,
+            "question": item["Query"],
+            "ground_truth": item["Expected Answer"],
+            "answer": answer,
+            "retrieved_contexts": [s["description"] for s in spots],
+        }
+        rows[(row["config"], index)] = row
+        checkpoint.write(json.dumps(row, ensure_ascii=False) + "\n")
+        checkpoint.flush()
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        with open(rows_path, "a", encoding="utf-8") as checkpoint:
+            results = await asyncio.gather(
+                *(generate(config, index, semaphore, checkpoint) for config, index in pending),
+                return_exceptions=True
+            )
+        failures = [r for r in results if isinstance(r, Exception)]
+        for failure in failures:
+            print(f"  Generation failed: {failure}")
+        return len(failures)
+
+    return asyncio.run(run())
+
+def score_configs(ground_truth, configs, rows):
+    """RAGAS metrics per config, in the full_eval_summary.pkl layout"""
+    from datasets import Dataset
+    from ragas import evaluate
+    from ragas.metrics import faithfulness, answer_relevancy, context_precision
+
+    summaries = []
+    for model, temperature, top_k in configs:
+        key = config_key(model, temperature, top_k)
+        config_rows = [rows[(key, i)] for i in range(len(ground_truth)) if (key, i) in rows]
+        df = pd.DataFrame([
+            {k: row[k] for k in ("question", "ground_truth", "answer", "retrieved_contexts")}
+            for row in config_rows
+        ])
+        results = evaluate(
+            Dataset.from_pandas(df),
+            metrics=[faithfulness, answer_relevancy, context_precision],
+            show_progress=False
+        )
+        summaries.append({
+            "model":            model,
+            "temperature":      temperature,
+            "top_k":            top_k,
+            "faithfulness":     sum(results["faithfulness"]) / len(results["faithfulness"]),
+            "answer_relevancy": sum(results["answer_relevancy"]) / len(results["answer_relevancy"]),
+            "context_precision":sum(results["context_precision"]) / len(results["context_precision"])
+        })
+    return pd.DataFrame(summaries)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the surf report RAG pipeline over a parameter grid.")
+    parser.add_argument("--ground-truth", default="notebooks/ground_truth_rag_surf.json")
+    parser.add_argument("--models", nargs="+", default=["gpt-4o", "o3-mini"])
+    parser.add_argument("--temperatures", nargs="+", type=float, default=[0.3, 0.7])
+    parser.add_argument("--top-ks", nargs="+", type=int, default=[3, 10])
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent API calls")
+    parser.add_argument("--rows", default="outputs/eval_rows.jsonl",
+                        help="Per-row checkpoint; rerunning resumes from it")
+    parser.add_argument("--output", default="outputs/full_eval_summary.pkl")
+    parser.add_argument("--skip-scoring", action="store_true", help="Only generate, do not run RAGAS")
+    args = parser.parse_args()
+
+    with open(args.ground_truth, "r", encoding="utf-8") as f:
+        ground_truth = json.load(f)
+    configs = list(product(args.models, args.temperatures, args.top_ks))
+    os.makedirs(os.path.dirname(args.rows) or ".", exist_ok=True)
+
+    forecast = get_weekend_forecast()
+    spots_per_query = retrieve_all(ground_truth, args.top_ks, args.concurrency)
+    rows = load_rows(args.rows)
+    failures = generate_all(ground_truth, spots_per_query, forecast, configs, rows, args.rows,
+                            args.concurrency)
+    if failures:
+        raise SystemExit(f"{failures} generations failed; rerun to resume from {args.rows}.")
+
+    if not args.skip_scoring:
+        results_df = score_configs(ground_truth, configs, rows)
+        print("## Final Evaluation Summary")
+        print(results_df)
+        results_df.to_pickle(args.output)
+        print(f"Summary saved to {args.output}")
@@ -1,103 +1,207 @@
+import argparse
+import os
+import random
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup, SoupStrainer
 import json
 
+# Only these widgets are read from a spot page, so the parser skips building the rest of the tree
+SPOT_PAGE_CLASSES = {
+    "elementor-widget-text-editor",
+    "elementor-element-2d7b5d4",
+    "elementor-widget-star-rating",
+    "elementor-widget-rating",
+    "elementor-widget-tideRating",
+}
+SPOT_PAGE_STRAINER = SoupStrainer(
+    "div", class_=lambda value: bool(value) and not SPOT_PAGE_CLASSES.isdisjoint(value.split())
+)
+SPOT_LINK_STRAINER = SoupStrainer("a", class_="elementor-button-link")
+
+# Per-host rate limiter shared by all worker threads
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# Pooled keep-alive session sized for the worker count
+def create_session(pool_size=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "surfreporter-scraper"})
+    return session
+
+# GET with exponential backoff on connection errors, 429 and 5xx responses
+def fetch_page(url, session=None, rate_limiter=None, retries=3, backoff=1.0, timeout=30):
+    session = session or requests
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.wait(url)
+        try:
+            response = session.get(url, timeout=timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == retries:
+                    response.raise_for_status()
+            else:
+                response.raise_for_status()
+                return response.content
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+
 # Function to extract all surf spot URLs
-def extract_surf_spot_urls(base_url):
+def extract_surf_spot_urls(base_url, session=None, rate_limiter=None, retries=3):
     try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        content = fetch_page(base_url, session, rate_limiter, retries)
+        soup = BeautifulSoup(content, 'html.parser', parse_only=SPOT_LINK_STRAINER)
         spot_links = soup.find_all('a', class_='elementor-button-link')
-        spot_urls = [link.get('href') for link in spot_links if link.get('href')]
-        return list(set(spot_urls))
+        spot_urls = [urljoin(base_url, link.get('href')) for link in spot_links if link.get('href')]
+        return sorted(set(spot_urls))
     except Exception as e:
         return {"error": f"Error fetching the page: {e}"}
 
 # Function to extract details of each surf spot
-def extract_surf_spot_info(url):
+def extract_surf_spot_info(url, session=None, rate_limiter=None, retries=3):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        text_editor_divs = soup.find_all('div', class_='elementor-widget-text-editor')
-        categories = [
-            "Type of Bottom",
-            "Direction of Wave",
-            "Best Wind Direction",
-            "Best Swell Direction",
-            "Swell Size",
-            "Length of Wave",
-            "Best Season"
-        ]
-
-        extracted_info = {
-            category: text_editor_divs[idx].get_text(strip=True) if idx < len(text_editor_divs) else "Not available"
-            for idx, category in enumerate(categories)
+        content = fetch_page(url, session, rate_limiter, retries)
+        return parse_surf_spot_page(content)
+    except Exception as e:
+        return {"error": f"Error fetching the page: {e}"}
+
+# Parse one saved or downloaded spot page into the surf_spots.json details schema
+# Pass parse_only=None to build the full tree (reference output for benchmarks/bench_scraper_parse.py)
+def parse_surf_spot_page(content, parse_only=SPOT_PAGE_STRAINER):
+    soup = BeautifulSoup(content, 'html.parser', parse_only=parse_only)
+
+    text_editor_divs = soup.find_all('div', class_='elementor-widget-text-editor')
+    categories = [
+        "Type of Bottom",
+        "Direction of Wave",
+        "Best Wind Direction",
+        "Best Swell Direction",
+        "Swell Size",
+        "Length of Wave",
+        "Best Season"
+    ]
+
+    extracted_info = {
+        category: text_editor_divs[idx].get_text(strip=True) if idx < len(text_editor_divs) else "Not available"
+        for idx, category in enumerate(categories)
+    }
+
+    def get_spot_description():
+        container = soup.find('div', class_='elementor-element-2d7b5d4')
+        if container:
+            paragraphs = container.find_all('p')
+            return "\n".join([p.get_text(strip=True) for p in paragraphs])
+        return "Spot description not available."
+
+    extracted_info["Spot Description"] = get_spot_description()
+
+    star_containers = soup.find_all('div', class_='elementor-widget-star-rating')
+    categories_stars = ["Consistency", "Crowd Factor", "Localism"]
+    if len(star_containers) >= 3:
+        star_ratings = {
+            categories_stars[i]: sum(
+                1 for star in star_containers[i].find_all('i') if 'elementor-star-full' in star.get('class', [])
+            )
+            for i in range(len(categories_stars))
         }
+    else:
+        star_ratings = "Not enough star rating containers found."
+    extracted_info["Star Ratings"] = star_ratings
 
-        def get_spot_description():
-            container = soup.find('div', class_='elementor-element-2d7b5d4')
-            if container:
-                paragraphs = container.find_all('p')
-                return "\n".join([p.get_text(strip=True) for p in paragraphs])
-            return "Spot description not available."
-
-        extracted_info["Spot Description"] = get_spot_description()
-
-        star_containers = soup.find_all('div', class_='elementor-widget-star-rating')
-        categories_stars = ["Consistency", "Crowd Factor", "Localism"]
-        if len(star_containers) >= 3:
-            star_ratings = {
-                categories_stars[i]: sum(
-                    1 for star in star_containers[i].find_all('i') if 'elementor-star-full' in star.get('class', [])
-                )
-                for i in range(len(categories_stars))
-            }
-        else:
-            star_ratings = "Not enough star rating containers found."
-        extracted_info["Star Ratings"] = star_ratings
-
-        def get_box_colors(container_class):
-            container = soup.find('div', class_=container_class)
-            if not container:
-                return f"Container with class {container_class} not found."
-            rects = container.find_all('rect')
-            color_mapping = {
-                "fill:#000000;stroke-width:1;opacity:0.1;": "light",
-                "fill:#000000;": "dark",
-                "fill:#9E9B9B;": "grey"
-            }
-            return [color_mapping.get(rect.get('style', ''), "unknown") for rect in rects]
+    def get_box_colors(container_class):
+        container = soup.find('div', class_=container_class)
+        if not container:
+            return f"Container with class {container_class} not found."
+        rects = container.find_all('rect')
+        color_mapping = {
+            "fill:#000000;stroke-width:1;opacity:0.1;": "light",
+            "fill:#000000;": "dark",
+            "fill:#9E9B9B;": "grey"
+        }
+        return [color_mapping.get(rect.get('style', ''), "unknown") for rect in rects]
 
-        extracted_info["Surf Level Box Colors"] = get_box_colors('elementor-widget-rating')
-        extracted_info["Best Tide Box Colors"] = get_box_colors('elementor-widget-tideRating')
+    extracted_info["Surf Level Box Colors"] = get_box_colors('elementor-widget-rating')
+    extracted_info["Best Tide Box Colors"] = get_box_colors('elementor-widget-tideRating')
 
-        return extracted_info
-    except Exception as e:
-        return {"error": f"Error fetching the page: {e}"}
+    return extracted_info
+
+# Checkpoint: one {"url", "details"} JSON line per finished spot, appended as they complete
+def load_checkpoint(path):
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record["url"]] = record
+    return done
 
 # Main function to scrape all spots
-def scrape_all_surf_spots():
-    base_url = "https://www.ericeirasurfhouse.com/surf-spots/"
+def scrape_all_surf_spots(base_url="https://www.ericeirasurfhouse.com/surf-spots/",
+                          concurrency=8, rate_limit=4.0, retries=3, checkpoint=None):
+    session = create_session(concurrency)
+    rate_limiter = RateLimiter(rate_limit)
     print("Extracting surf spot URLs...")
-    surf_spot_urls = extract_surf_spot_urls(base_url)
+    surf_spot_urls = extract_surf_spot_urls(base_url, session, rate_limiter, retries)
 
     if isinstance(surf_spot_urls, dict) and "error" in surf_spot_urls:
         print(surf_spot_urls["error"])
         return
 
     print(f"Found {len(surf_spot_urls)} surf spots.")
-    all_spot_info = []
-    for url in surf_spot_urls:
-        print(f"Scraping details for {url}...")
-        spot_info = extract_surf_spot_info(url)
-        if "error" in spot_info:
-            print(f"  Error for {url}: {spot_info['error']}")
-        else:
-            all_spot_info.append({"url": url, "details": spot_info})
-    return all_spot_info
+    results = load_checkpoint(checkpoint)
+    pending = [url for url in surf_spot_urls if url not in results]
+    if results:
+        print(f"Resuming: {len(surf_spot_urls) - len(pending)} spots already in {checkpoint}.")
+
+    checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(extract_surf_spot_info, url, session, rate_limiter, retries): url
+                for url in pending
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                spot_info = future.result()
+                if "error" in spot_info:
+                    print(f"  Error for {url}: {spot_info['error']}")
+                    continue
+                print(f"Scraped details for {url}")
+                record = {"url": url, "details": spot_info}
+                results[url] = record
+                if checkpoint_file:
+                    checkpoint_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    checkpoint_file.flush()
+    finally:
+        if checkpoint_file:
+            checkpoint_file.close()
+
+    # Keep the listing order regardless of completion order
+    return [results[url] for url in surf_spot_urls if url in results]
 
 # Function to save data to JSON
 def save_to_json(data, filename="surf_spots.json"):
@@ -107,6 +211,21 @@ def save_to_json(data, filename="surf_spots.json"):
 
 # Run the script
 if __name__ == "__main__":
-    surf_spot_data = scrape_all_surf_spots()
+    parser = argparse.ArgumentParser(description="Scrape surf spot pages into surf_spots.json.")
+    parser.add_argument("--base-url", default="https://www.ericeirasurfhouse.com/surf-spots/")
+    parser.add_argument("--output", default="surf_spots.json")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel page downloads")
+    parser.add_argument("--rate-limit", type=float, default=4.0,
+                        help="Maximum requests per second per host (0 disables)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--checkpoint", default="surf_spots.checkpoint.jsonl",
+                        help="Progress file used to resume an interrupted crawl")
+    args = parser.parse_args()
+
+    surf_spot_data = scrape_all_surf_spots(args.base_url, args.concurrency, args.rate_limit,
+                                           args.retries, args.checkpoint)
     if surf_spot_data:
-        save_to_json(surf_spot_data)
+        save_to_json(surf_spot_data, args.output)
+        # The crawl finished, so the next run should start fresh
+        if args.checkpoint and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator, Union
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_sockets
+from tornado.process import fork_processes
+from forecast import get_weekend_forecast, ForecastUnavailable
+from pipeline import SurfReportPipeline
+from services import get_services
+from spot_attributes import skill_index
+from telemetry import metrics
+
+# Headless HTTP API over the same pipeline as app.py.
+# Run with: PYTHONPATH=src python src/api.py --port 8000 --workers 4
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first runs `fn` on the executor and
+    every caller that arrives while it is in flight awaits the same result.
+    """
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, fn: Callable, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A disconnecting client must not cancel the call for everyone else waiting on it
+        return await asyncio.shield(future)
+
+    def stream(self, key, fn: Callable[[], Iterator[str]]) -> AsyncIterator[str]:
+        """Like run, for a blocking chunk iterator; late joiners replay the chunks sent so far"""
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            self.calls += 1
+            broadcast = _Broadcast()
+            self._inflight[key] = broadcast
+            loop = asyncio.get_running_loop()
+
+            def produce():
+                try:
+                    for chunk in fn():
+                        loop.call_soon_threadsafe(broadcast.push, chunk)
+                except Exception as e:
+                    loop.call_soon_threadsafe(broadcast.finish, e)
+                else:
+                    loop.call_soon_threadsafe(broadcast.finish, None)
+
+            broadcast.on_finish = lambda: self._inflight.pop(key, None)
+            loop.run_in_executor(self.executor, produce)
+        else:
+            self.coalesced += 1
+        return broadcast.follow()
+
+class _Broadcast:
+    """Chunks of one in-flight stream, fanned out to any number of followers on the event loop"""
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.on_finish: Optional[Callable[[], None]] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[Exception]) -> None:
+        self.done = True
+        self.error = error
+        if self.on_finish is not None:
+            self.on_finish()
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+_REQUIRED = object()
+
+# Parameter casts: JSON bodies can hold any type, so each one checks it before converting.
+# Values must also be hashable, as they become part of the SingleFlight key.
+def _text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError("expected a string")
+    return value
+
+def _integer(value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError("expected an integer")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError("expected an integer")
+    return int(value)
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError("expected a number")
+    return float(value)
+
+def _skill_level(value: Any) -> Union[str, int]:
+    """A position on the surf level scale or a level name known to skill_index"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError("expected a level name or number")
+    skill_index(value)  # ValueError for unknown names
+    return value
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, pipeline: SurfReportPipeline, flight: SingleFlight):
+        self.pipeline = pipeline
+        self.flight = flight
+
+    def prepare(self):
+        self.body_args = {}
+        if self.request.body:
+            try:
+                self.body_args = json.loads(self.request.body)
+            except json.JSONDecodeError:
+                raise tornado.web.HTTPError(400, "Request body must be JSON")
+            if not isinstance(self.body_args, dict):
+                raise tornado.web.HTTPError(400, "Request body must be a JSON object")
+
+    def param(self, name: str, default: Any = _REQUIRED, cast: Callable[[Any], Any] = _text):
+        """Read a parameter from the JSON body or the query string"""
+        if name in self.body_args:
+            value = self.body_args[name]
+        else:
+            value = self.get_argument(name, None)
+        if value is None:
+            if default is _REQUIRED:
+                raise tornado.web.MissingArgumentError(name)
+            return default
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise tornado.web.HTTPError(400, f"Invalid value for {name}: {value}")
+
+    def retrieval_params(self) -> tuple:
+        return (
+            self.param("query"),
+            self.param("direction"),
+            self.param("bottom"),
+            self.param("top_k", 3, _integer),
+            self.param("skill_level", None, _skill_level),
+        )
+
+    def write_json(self, payload: Dict[str, Any]) -> None:
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(json.dumps(payload, ensure_ascii=False, default=str))
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        reason = self._reason
+        if "exc_info" in kwargs and isinstance(kwargs["exc_info"][1], tornado.web.HTTPError):
+            reason = kwargs["exc_info"][1].log_message or reason
+        self.write_json({"error": reason})
+
+class RetrieveHandler(BaseHandler):
+    async def get(self):
+        params = self.retrieval_params()
+
+        def retrieve():
+            retriever = self.pipeline.services.retriever()
+            return retriever.retrieve_spots(*params), retriever.last_path
+
+        spots, path = await self.flight.run(("retrieve",) + params, retrieve)
+        self.write_json({"spots": spots, "path": path})
+
+    post = get
+
+class ForecastHandler(BaseHandler):
+    async def get(self):
+        try:
+            forecast = await self.flight.run(("forecast",), get_weekend_forecast)
+        except ForecastUnavailable as e:
+            raise tornado.web.HTTPError(503, str(e))
+        self.write_json({"forecast": forecast})
+
+class ReportHandler(BaseHandler):
+    async def get(self):
+        params = self.retrieval_params()
+        model = self.param("model", "gpt-4o")
+        temperature = self.param("temperature", 0.3, _number)
+
+        if not self.param("stream", False, lambda v: str(v).lower() in ("1", "true", "yes")):
+            result = await self.flight.run(
+                ("report", model, temperature) + params, self.pipeline.run,
+                params[0], params[1], params[2], params[3], model, temperature, params[4]
+            )
+            self.write_json(asdict(result))
+            return
+
+        prepared = await self.flight.run(("prepare",) + params, self.pipeline.prepare, *params)
+        if "retrieval" in prepared.errors:
+            raise tornado.web.HTTPError(502, f"Retrieval failed: {prepared.errors['retrieval']}")
+        generator = self.pipeline.services.report_generator(prepared.spots, prepared.forecast, model, temperature,
+                                                            regional_forecasts=prepared.regional_forecasts)
+
+        self.set_header("Content-Type", "text/plain; charset=UTF-8")
+        self.set_header("X-Spots", json.dumps([spot["name"] for spot in prepared.spots]))
+        try:
+            stream = self.flight.stream(generator.request_key(params[0]),
+                                        lambda: generator.generate_report_stream(params[0]))
+            async for chunk in stream:
+                self.write(chunk)
+                await self.flush()
+        except StreamClosedError:
+            pass  # client went away; the generation continues for other followers
+
+    post = get
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.write_json({"status": "ok", "calls": self.flight.calls, "coalesced": self.flight.coalesced})
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        """Prometheus text exposition, or JSON with ?format=json"""
+        if self.param("format", "prometheus") == "json":
+            self.write_json(metrics.snapshot())
+            return
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=UTF-8")
+        self.write(metrics.render_prometheus())
+
+def make_app(pipeline: Optional[SurfReportPipeline] = None, max_workers: int = 32) -> tornado.web.Application:
+    pipeline = pipeline or SurfReportPipeline()
+    handler_args = {"pipeline": pipeline, "flight": SingleFlight(ThreadPoolExecutor(max_workers=max_workers))}
+    return tornado.web.Application([
+        (r"/retrieve", RetrieveHandler, handler_args),
+        (r"/forecast", ForecastHandler, handler_args),
+        (r"/report", ReportHandler, handler_args),
+        (r"/health", HealthHandler, handler_args),
+        (r"/metrics", MetricsHandler, handler_args),
+    ])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve retrieval, forecasts and surf reports over HTTP.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--threads", type=int, default=32, help="Blocking calls in flight per worker")
+    parser.add_argument("--no-warmup", action="store_true", help="Build clients on first request instead")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Bind before forking so every worker accepts on the same port
+    sockets = bind_sockets(args.port)
+    if args.workers != 1:
+        fork_processes(args.workers)
+
+    async def serve():
+        # Clients are built after the fork: connection pools must not be shared between processes
+        pipeline = SurfReportPipeline(get_services(warmup=not args.no_warmup), max_workers=args.threads)
+        server = HTTPServer(make_app(pipeline, args.threads))
+        server.add_sockets(sockets)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
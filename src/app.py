@@ -1,46 +1,99 @@
+import time
 import streamlit as st
-from search import SurfSpotRetriever
-from forecast import get_weekend_forecast
-from report_generator import SurfReportGenerator
+from config import WARMUP_ON_START, PRECOMPUTE_REPORTS
+from services import get_services, DEFAULT_QUERY
+from pipeline import SurfReportPipeline
+from precompute import ForecastRefresher
+from spot_attributes import WAVE_DIRECTIONS, BOTTOM_TYPES
+
+@st.cache_resource
+def load_pipeline():
+    """Shared by all sessions and reruns of this Streamlit process"""
+    return SurfReportPipeline(get_services(warmup=WARMUP_ON_START))
+
+@st.cache_resource
+def load_refresher():
+    """Background thread keeping the default-query reports current; None when disabled"""
+    if not PRECOMPUTE_REPORTS:
+        return None
+    return ForecastRefresher(load_pipeline()).start()
+
+def render_spot_details(spots):
+    st.subheader("Spot Details")
+    for spot in spots:
+        with st.expander(f"{spot['name']} ({spot['surf_level']})"):
+            st.write(f"**🌊 Wave Direction:** {spot['wave_direction']}")
+            st.write(f"**🏖️ Bottom Type:** {spot['bottom_type']}")
+            st.write(f"**👥 Crowd Factor:** {spot['crowd_factor']}")
+            st.write(spot['description'])
 
 def main():
+    pipeline = load_pipeline()
+    refresher = load_refresher()
+
     st.title("🏄 Weekend Surf Report Generator")
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        preferred_direction = st.selectbox("Preferred Wave Direction", ["Right","Left","Left and right"])
+        preferred_direction = st.selectbox("Preferred Wave Direction", WAVE_DIRECTIONS)
     with col2:
-        preferred_bottom = st.selectbox("Preferred Bottom Type", ["Reef","Sand","Sand with rocks"])
+        preferred_bottom = st.selectbox("Preferred Bottom Type", BOTTOM_TYPES)
     with col3:
         top_k = st.number_input("Top-k Spots to Retrieve", 1, 10, 3)
 
+    skill_level = st.selectbox("Your Surf Level", ["Any","Beginner","Intermediate","Advanced","Expert"])
     generation_model = st.selectbox("Generation Model", ["gpt-4o","o3-mini"])
     temperature = st.slider("Temperature", 0.0, 1.0, 0.3, 0.05)
 
-    user_query = st.text_input("Describe your ideal surf session", "Fun right-handers with reef bottom")
+    user_query = st.text_input("Describe your ideal surf session", DEFAULT_QUERY)
 
     if st.button("Generate Report"):
+        skill_level = None if skill_level == "Any" else skill_level
+        precomputed = refresher and refresher.lookup(
+            user_query, preferred_direction, preferred_bottom, top_k, generation_model, temperature, skill_level
+        )
+        if precomputed:
+            st.subheader("Your Personalized Surf Report")
+            st.write(precomputed["report"])
+            generated = time.strftime("%a %H:%M", time.localtime(precomputed["generated_at"]))
+            st.caption(f"Precomputed for the current forecast ({generated})")
+            render_spot_details(precomputed["spots"])
+            return
+
         with st.spinner("Generating..."):
-            retriever = SurfSpotRetriever()
-            spots = retriever.retrieve_spots(
-                user_query, preferred_direction, preferred_bottom, top_k
+            # Retrieval and the forecast fetch run concurrently
+            prepared = pipeline.prepare(
+                user_query, preferred_direction, preferred_bottom, top_k, skill_level
             )
-            forecast = get_weekend_forecast()
-            generator = SurfReportGenerator(
-                spots, forecast, generation_model, temperature
+        if "retrieval" in prepared.errors:
+            st.error(f"Could not retrieve surf spots: {prepared.errors['retrieval']}")
+            return
+        if "forecast" in prepared.errors:
+            st.warning(f"Forecast unavailable: {prepared.errors['forecast']}")
+        spots = prepared.spots
+        generator = pipeline.services.report_generator(
+            spots, prepared.forecast, generation_model, temperature,
+            regional_forecasts=prepared.regional_forecasts
+        )
+
+        st.subheader("Your Personalized Surf Report")
+        # Render the report as it is generated instead of after the full response
+        st.write_stream(generator.generate_report_stream(user_query))
+        timings = generator.last_timings
+        stages = (
+            f"retrieval {prepared.timings.get('retrieval', 0):.2f}s, "
+            f"forecast {prepared.timings.get('forecast', 0):.2f}s"
+        )
+        if timings.get("cached"):
+            st.caption(f"Served from the report cache ({stages})")
+        else:
+            st.caption(
+                f"First token after {timings['time_to_first_token']:.1f}s, "
+                f"complete after {timings['total']:.1f}s from a "
+                f"{generator.prompt_tokens.get('total', 0)}-token prompt ({stages})"
             )
-            report = generator.generate_report(user_query)
 
-            st.subheader("Your Personalized Surf Report")
-            st.markdown(report)
-
-            st.subheader("Spot Details")
-            for spot in spots:
-                with st.expander(f"{spot['name']} ({spot['surf_level']})"):
-                    st.write(f"**🌊 Wave Direction:** {spot['wave_direction']}")
-                    st.write(f"**🏖️ Bottom Type:** {spot['bottom_type']}")
-                    st.write(f"**👥 Crowd Factor:** {spot['crowd_factor']}")
-                    st.write(spot['description'])
+        render_spot_details(spots)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, Union
+from embedding_cache import normalize_text
+from pipeline import SurfReportPipeline, PipelineResult
+from resilience import CircuitOpenError, DependencyError
+from telemetry import metrics
+
+@dataclass
+class SubscriberProfile:
+    """One newsletter subscriber's saved report settings"""
+    user_id: str
+    query: str
+    preferred_direction: str
+    preferred_bottom: str
+    top_k: int = 3
+    generation_model: str = 'gpt-4o'
+    temperature: float = 0.3
+    skill_level: Optional[Union[str, int]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SubscriberProfile":
+        fields = set(cls.__dataclass_fields__)
+        return cls(**{key: value for key, value in data.items() if key in fields})
+
+    def retrieval_key(self) -> tuple:
+        """Subscribers with the same key get the same spots"""
+        return (normalize_text(self.query), self.preferred_direction.strip().lower(),
+                self.preferred_bottom.strip().lower(), self.top_k, str(self.skill_level))
+
+def load_profiles(path: str) -> List[SubscriberProfile]:
+    """Profiles from a JSON list or a JSON Lines file"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        records = json.loads(content)
+    else:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return [SubscriberProfile.from_dict(record) for record in records]
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the API asked us to wait, from a Retry-After header when there is one"""
+    if isinstance(error, CircuitOpenError):
+        # Rate limits can open the breaker: wait until it lets a trial call through
+        return error.retry_after or None
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    return (status == 429 or (status is not None and status >= 500)
+            or isinstance(error, (TimeoutError, ConnectionError, DependencyError)))
+
+class BatchReportGenerator:
+    """
+    Generates reports for many subscribers, one generation per distinct request.
+    Subscribers are collapsed twice: identical retrieval settings share one retrieval, and
+    identical prompts (same spots, query, model, temperature) share one generation.
+    Throughput therefore scales with the number of distinct prompts, not subscribers.
+    """
+    def __init__(self,
+                 pipeline: Optional[SurfReportPipeline] = None,
+                 concurrency: int = 8,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.pipeline = pipeline or SurfReportPipeline()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # After a rate limit every worker pauses until this time, not just the one that hit it
+        self._resume_at = 0.0
+        self.stats: Dict[str, int] = {}
+
+    async def _with_backoff(self, fn: Callable, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                self.stats["retries"] += 1
+                metrics.inc("surf_batch_retries_total", status=getattr(e, "status_code", None) or type(e).__name__)
+
+    async def _retrieve(self, profile: SubscriberProfile, semaphore: asyncio.Semaphore) -> PipelineResult:
+        async with semaphore:
+            self.stats["retrievals"] += 1
+            try:
+                # Rate limits and timeouts are retried with the same backoff as generation
+                return await self._with_backoff(
+                    self.pipeline.prepare, profile.query, profile.preferred_direction,
+                    profile.preferred_bottom, profile.top_k, profile.skill_level,
+                    raise_retrieval_errors=True
+                )
+            except Exception as e:
+                raise RuntimeError(f"Retrieval failed: {e}") from e
+
+    async def _generate(self, generator, query: str, semaphore: asyncio.Semaphore) -> str:
+        async with semaphore:
+            self.stats["generations"] += 1
+            return await self._with_backoff(generator.generate_report, query)
+
+    async def generate(self,
+                       profiles: List[SubscriberProfile],
+                       on_result: Callable[[Dict[str, Any]], None]) -> Dict[str, int]:
+        """Call on_result with one record per subscriber as soon as that subscriber's report is ready"""
+        self.stats = {"profiles": len(profiles), "retrievals": 0, "generations": 0, "retries": 0, "failures": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # In-flight work keyed by request; everything runs on one event loop, so no locking is needed
+        retrievals: Dict[tuple, asyncio.Future] = {}
+        generations: Dict[str, asyncio.Future] = {}
+
+        async def serve(profile: SubscriberProfile):
+            record = {"user_id": profile.user_id}
+            try:
+                key = profile.retrieval_key()
+                if key not in retrievals:
+                    retrievals[key] = asyncio.ensure_future(self._retrieve(profile, semaphore))
+                prepared = await retrievals[key]
+
+                generator = self.pipeline.services.report_generator(
+                    prepared.spots, prepared.forecast, profile.generation_model, profile.temperature,
+                    regional_forecasts=prepared.regional_forecasts
+                )
+                request_key = generator.request_key(profile.query)
+                if request_key not in generations:
+                    generations[request_key] = asyncio.ensure_future(
+                        self._generate(generator, profile.query, semaphore)
+                    )
+                record["report"] = await generations[request_key]
+                record["spots"] = [spot["name"] for spot in prepared.spots]
+                if prepared.errors:
+                    record["warnings"] = prepared.errors
+            except Exception as e:
+                self.stats["failures"] += 1
+                record["error"] = str(e)
+            on_result(record)
+
+        await asyncio.gather(*(serve(profile) for profile in profiles))
+        return self.stats
+
+    def run(self, profiles: List[SubscriberProfile], output_path: str) -> Dict[str, int]:
+        """Write one JSON line per subscriber to output_path, flushed as each report completes"""
+        with open(output_path, "w", encoding="utf-8") as output:
+            def write(record):
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            return asyncio.run(self.generate(profiles, write))
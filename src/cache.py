@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class TwoTierCache:
+    """
+    Byte-value cache with an in-memory LRU in front of an optional SQLite file.
+    Both tiers are bounded by item count; the disk tier evicts least recently used rows.
+    Disk hits record their access time in memory and write it back in batches, with the next
+    set() or every ACCESS_FLUSH_BATCH hits, so reads do not each open a write transaction.
+    """
+    ACCESS_FLUSH_BATCH = 64
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_memory_items: int = 1024,
+                 max_disk_items: int = 100_000):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._disk_items = 0
+        self._accessed: Dict[str, float] = {}
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._disk_items = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _remember(self, key: str, value: bytes) -> None:
+        """Insert into the memory tier, evicting the least recently used entry"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._accessed[key] = time.time()
+                    if len(self._accessed) >= self.ACCESS_FLUSH_BATCH:
+                        self._flush_accessed()
+                        self._conn.commit()
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is None:
+                return
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            exists = self._conn.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, accessed) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time())
+            )
+            if not exists:
+                self._disk_items += 1
+            if self._disk_items > self.max_disk_items:
+                self._evict_disk()
+            self._conn.commit()
+
+    def _flush_accessed(self) -> None:
+        """Write pending access times of disk hits; the caller commits"""
+        if not self._accessed:
+            return
+        self._conn.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def _evict_disk(self) -> None:
+        """Drop the oldest 10% of rows so eviction is amortised over many inserts"""
+        self._disk_items = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = self._disk_items - self.max_disk_items
+        if excess <= 0:
+            return
+        excess += self.max_disk_items // 10
+        self._conn.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)", (excess,)
+        )
+        self.evictions += excess
+        self._disk_items = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._accessed.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.commit()
+                self._disk_items = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": self._disk_items,
+            }
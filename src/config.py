@@ -1,11 +1,103 @@
 import os
-from dotenv import load_dotenv
 
-# Load variables from .env file
-load_dotenv()  
+def _find_dotenv() -> str:
+    """Nearest .env in this directory or a parent, as python-dotenv would find it"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return ""
+        directory = parent
+
+# Load variables from .env file; dotenv is only imported when there is one to load
+_dotenv_path = _find_dotenv()
+if _dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(_dotenv_path)
 
 # Access variables
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 IPMA_API_KEY = os.getenv("IPMA_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
\ No newline at end of file
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Vector search backend: "pinecone" (remote) or "local" (in-process NumPy index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "data/surfspots_index")
+
+# Query/document embedding cache (set EMBEDDING_CACHE_PATH to "" for memory only)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "1024"))
+EMBEDDING_CACHE_DISK_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "100000"))
+
+# IPMA forecast cache: serve from memory for FORECAST_TTL_SECONDS, then serve stale
+# data for up to FORECAST_STALE_SECONDS more while refreshing in the background
+FORECAST_TTL_SECONDS = float(os.getenv("FORECAST_TTL_SECONDS", "1800"))
+FORECAST_STALE_SECONDS = float(os.getenv("FORECAST_STALE_SECONDS", "21600"))
+
+# Optional {spot id or name: [latitude, longitude]} file; ingest stores the coordinates so each
+# spot is served the forecast of its nearest IPMA region (spots without them use the Lisbon coast)
+SPOT_COORDINATES_PATH = os.getenv("SPOT_COORDINATES_PATH", "data/spot_coordinates.json")
+
+# Generated report cache (set REPORT_CACHE_PATH to "" for memory only)
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", "data/cache/reports.sqlite")
+REPORT_CACHE_MEMORY_ITEMS = int(os.getenv("REPORT_CACHE_MEMORY_ITEMS", "256"))
+REPORT_CACHE_DISK_ITEMS = int(os.getenv("REPORT_CACHE_DISK_ITEMS", "5000"))
+
+# Build and connect all clients when a process starts rather than on the first request
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
+# Per-stage deadlines (seconds) for the request pipeline
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "15"))
+FORECAST_TIMEOUT_SECONDS = float(os.getenv("FORECAST_TIMEOUT_SECONDS", "10"))
+GENERATION_TIMEOUT_SECONDS = float(os.getenv("GENERATION_TIMEOUT_SECONDS", "120"))
+
+# External dependency calls (see resilience.py): timeout caps, hedge delays for idempotent reads
+# and circuit breakers. Set RESILIENCE_ENABLED=0 to call the clients directly.
+RESILIENCE_ENABLED = os.getenv("RESILIENCE_ENABLED", "1") == "1"
+IPMA_TIMEOUT_SECONDS = float(os.getenv("IPMA_TIMEOUT_SECONDS", "5"))
+IPMA_HEDGE_SECONDS = float(os.getenv("IPMA_HEDGE_SECONDS", "1.0"))
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "5"))
+EMBEDDING_HEDGE_SECONDS = float(os.getenv("EMBEDDING_HEDGE_SECONDS", "0.5"))
+INDEX_TIMEOUT_SECONDS = float(os.getenv("INDEX_TIMEOUT_SECONDS", "5"))
+INDEX_HEDGE_SECONDS = float(os.getenv("INDEX_HEDGE_SECONDS", "0.3"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Retrieval: "vector" or "hybrid" (BM25 + vector, fused with reciprocal-rank fusion).
+# Hybrid queries whose lexical confidence over the top_k keyword results reaches
+# LEXICAL_CONFIDENCE skip the embedding call. Otherwise both rankings are fused at FUSION_DEPTH
+# candidates whatever top_k is, so the fused order does not depend on top_k.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index.json")
+LEXICAL_CONFIDENCE = float(os.getenv("LEXICAL_CONFIDENCE", "1.0"))
+FUSION_DEPTH = int(os.getenv("FUSION_DEPTH", "30"))
+
+# Per-spot swell arrays written at ingest; retrieval results are reranked by forecast suitability
+SPOT_CONDITIONS_PATH = os.getenv("SPOT_CONDITIONS_PATH", "data/spot_conditions.npz")
+SUITABILITY_WEIGHT = float(os.getenv("SUITABILITY_WEIGHT", "0.3"))
+
+# Token budget shared by all spot descriptions in the report prompt
+PROMPT_DESCRIPTION_TOKENS = int(os.getenv("PROMPT_DESCRIPTION_TOKENS", "600"))
+
+# Background refresher: polls the forecast and, when it changes, pregenerates reports for the
+# default query at every direction x bottom combination (set PRECOMPUTE_REPORTS=0 to disable)
+PRECOMPUTE_REPORTS = os.getenv("PRECOMPUTE_REPORTS", "1") == "1"
+PRECOMPUTE_INTERVAL_SECONDS = float(os.getenv("PRECOMPUTE_INTERVAL_SECONDS", "900"))
+PRECOMPUTE_TOP_KS = [int(k) for k in os.getenv("PRECOMPUTE_TOP_KS", "3,5").split(",")]
+PRECOMPUTE_MODEL = os.getenv("PRECOMPUTE_MODEL", "gpt-4o")
+PRECOMPUTE_TEMPERATURE = float(os.getenv("PRECOMPUTE_TEMPERATURE", "0.3"))
+PRECOMPUTED_REPORTS_PATH = os.getenv("PRECOMPUTED_REPORTS_PATH", "data/cache/precomputed.sqlite")
+# Instrumentation (see telemetry.py). TRACE_OUTPUT: "" (off), "stdout" or a JSON Lines file of
+# per-request span trees. METRICS_PATH: file rewritten with the metrics every METRICS_FLUSH_SECONDS
+# (Prometheus text, or JSON if it ends in .json). PROFILE_REQUESTS: "cpu", "memory" or "cpu,memory"
+# to write a cProfile/tracemalloc capture of every request to PROFILE_DIR.
+TRACE_OUTPUT = os.getenv("TRACE_OUTPUT", "")
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "60"))
+PROFILE_REQUESTS = {mode.strip() for mode in os.getenv("PROFILE_REQUESTS", "").split(",") if mode.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "outputs/profiles")
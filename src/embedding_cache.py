@@ -0,0 +1,84 @@
+import hashlib
+import threading
+from array import array
+from typing import List, Dict, Optional
+from cache import TwoTierCache
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MEMORY_ITEMS, EMBEDDING_CACHE_DISK_ITEMS
+from telemetry import metrics
+
+_shared_cache: Optional[TwoTierCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> TwoTierCache:
+    """Process-wide cache shared by the retriever, ingestion and evaluation"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = TwoTierCache(
+                    EMBEDDING_CACHE_PATH or None,
+                    max_memory_items=EMBEDDING_CACHE_MEMORY_ITEMS,
+                    max_disk_items=EMBEDDING_CACHE_DISK_ITEMS
+                )
+    return _shared_cache
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share an entry"""
+    return " ".join(text.split()).lower()
+
+class CachedEmbeddings:
+    """
+    Drop-in wrapper around a LangChain embeddings object.
+    Query and document embeddings are keyed separately since the API embeds them with different task types.
+    """
+    def __init__(self, embeddings, model_name: str, cache: Optional[TwoTierCache] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def _key(self, kind: str, text: str) -> str:
+        raw = f"{self.model_name}\x00{kind}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(value: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(value)
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        cached = self.cache.get(key)
+        metrics.inc("surf_cache_requests_total", cache="embeddings", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return self._decode(cached)
+        vector = self.embeddings.embed_query(text)
+        self.cache.set(key, self._encode(vector))
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed only the cache misses, in a single batched call"""
+        keys = [self._key("document", text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(i)
+                results.append(None)
+            else:
+                results.append(self._decode(cached))
+
+        if missing:
+            vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                self.cache.set(keys[i], self._encode(vector))
+                results[i] = vector
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
@@ -1,54 +1,353 @@
-import requests
-from datetime import datetime, timedelta
-from typing import Dict, Any
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextvars import copy_context
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+from config import FORECAST_TTL_SECONDS, FORECAST_STALE_SECONDS, IPMA_TIMEOUT_SECONDS
+from resilience import get_dependency, time_left
+from telemetry import metrics, span
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
 
 BASE_URL = "https://api.ipma.pt/open-data/forecast/oceanography/daily/hp-daily-sea-forecast-day{idDay}.json"
 TARGET_LOCAL_ID = 1111026  # Lisbon coast
+WEEKEND_DAYS = [1, 2]  # idDay of Saturday and Sunday
+
+class ForecastUnavailable(RuntimeError):
+    """No usable forecast could be fetched or parsed"""
+
+class RegionForecast:
+    """One coastal region of an IPMA sea forecast file"""
+    __slots__ = ("global_id", "latitude", "longitude",
+                 "wave_high_min", "wave_high_max", "wave_period_min", "wave_period_max",
+                 "pred_wave_dir", "sst_min", "sst_max")
+
+    def __init__(self, entry: Dict[str, Any]):
+        self.global_id = int(entry["globalIdLocal"])
+        self.latitude = float(entry["latitude"]) if entry.get("latitude") is not None else None
+        self.longitude = float(entry["longitude"]) if entry.get("longitude") is not None else None
+        self.wave_high_min = float(entry["waveHighMin"])
+        self.wave_high_max = float(entry["waveHighMax"])
+        self.wave_period_min = float(entry["wavePeriodMin"])
+        self.wave_period_max = float(entry["wavePeriodMax"])
+        self.pred_wave_dir = entry["predWaveDir"]
+        self.sst_min = float(entry["sstMin"])
+        self.sst_max = float(entry["sstMax"])
+
+class ForecastDay:
+    """All regions of one forecast file, indexed by globalIdLocal"""
+    __slots__ = ("date", "day_name", "regions", "_nearest")
+
+    def __init__(self, raw_data: Dict[str, Any]):
+        self.date = raw_data["forecastDate"]
+        forecast_date = datetime.strptime(self.date, "%Y-%m-%d")
+        self.day_name = forecast_date.strftime("%A").lower()  # "saturday"/"sunday"
+        self.regions: Dict[int, RegionForecast] = {}
+        for entry in raw_data["data"]:
+            try:
+                region = RegionForecast(entry)
+            except (KeyError, TypeError, ValueError):
+                continue  # skip incomplete regions instead of failing the whole file
+            self.regions[region.global_id] = region
+        # (latitude, longitude) -> nearest region, filled as spots are looked up
+        self._nearest: Dict[Tuple[float, float], Optional[int]] = {}
+
+    def nearest_region(self, latitude: float, longitude: float) -> Optional[int]:
+        """globalIdLocal of the closest region with coordinates (equirectangular distance), memoised"""
+        key = (latitude, longitude)
+        if key in self._nearest:
+            return self._nearest[key]
+        best_id, best_distance = None, math.inf
+        cos_lat = math.cos(math.radians(latitude))
+        for region in self.regions.values():
+            if region.latitude is None or region.longitude is None:
+                continue
+            dx = (region.longitude - longitude) * cos_lat
+            dy = region.latitude - latitude
+            distance = dx * dx + dy * dy
+            if distance < best_distance:
+                best_id, best_distance = region.global_id, distance
+        self._nearest[key] = best_id
+        return best_id
+
+class _CachedForecast:
+    __slots__ = ("data", "index", "etag", "last_modified", "fetched_at")
+
+    def __init__(self, data: Dict[str, Any], etag: Optional[str], last_modified: Optional[str]):
+        self.data = data
+        self.index = ForecastDay(data)  # built once per downloaded file
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+def create_session(pool_size: int, session: Optional["requests.Session"] = None) -> "requests.Session":
+    """Keep-alive session pooling `pool_size` connections per host"""
+    # requests is imported on first use: it is slow to import and idle workers never need it
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = session or requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class ForecastClient:
+    """
+    IPMA client with a pooled keep-alive session and a per-day TTL cache.
+    Fresh entries are served from memory; stale entries are served immediately while a
+    background conditional GET (ETag/Last-Modified) revalidates them.
+    Requests go through the "ipma" dependency (deadline-bound timeout, hedging, circuit breaker);
+    if IPMA is unreachable, an expired entry is served as the last known good forecast.
+    """
+    def __init__(self,
+                 ttl: float = FORECAST_TTL_SECONDS,
+                 stale_ttl: float = FORECAST_STALE_SECONDS,
+                 timeout: float = IPMA_TIMEOUT_SECONDS,
+                 max_workers: int = 4,
+                 session: Optional["requests.Session"] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._session = session
+        self._session_ready = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipma")
+        self._cache: Dict[int, _CachedForecast] = {}
+        self._refreshing = set()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self.dependency = get_dependency("ipma")
+
+    @property
+    def session(self) -> "requests.Session":
+        """Built on the first request"""
+        if not self._session_ready:
+            with self._lock:
+                if not self._session_ready:
+                    self._session = create_session(self.max_workers, self._session)
+                    self._session_ready = True
+        return self._session
+
+    def _get(self, url: str, headers: Dict[str, str], timeout: float) -> "requests.Response":
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        if response.status_code >= 500:
+            response.raise_for_status()  # server errors count as failures, so they are retried
+        return response
+
+    def _revalidate(self, idDay: int) -> _CachedForecast:
+        """Conditional GET; a 304 only extends the lifetime of the cached payload"""
+        with self._lock:
+            cached = self._cache.get(idDay)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        with span("ipma", idDay=idDay, conditional=bool(headers)) as current:
+            response = self.dependency.call(
+                self._get, BASE_URL.format(idDay=idDay), headers,
+                time_left(self.timeout), idempotent=True
+            )
+            current.attributes["status"] = response.status_code
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = time.monotonic()
+            return cached
+        response.raise_for_status()
+
+        entry = _CachedForecast(
+            response.json(),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified")
+        )
+        with self._lock:
+            self._cache[idDay] = entry
+        return entry
+
+    def _background_revalidate(self, idDay: int) -> None:
+        try:
+            self._revalidate(idDay)
+        except Exception as e:
+            logger.warning("Background refresh failed for idDay %s: %s", idDay, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(idDay)
+
+    def _get_entry(self, idDay: int) -> _CachedForecast:
+        with self._lock:
+            cached = self._cache.get(idDay)
+            age = time.monotonic() - cached.fetched_at if cached is not None else None
+            if cached is not None and age < self.ttl:
+                metrics.inc("surf_cache_requests_total", cache="forecast", result="hit")
+                return cached
+            if cached is not None and age < self.ttl + self.stale_ttl:
+                metrics.inc("surf_cache_requests_total", cache="forecast", result="stale")
+                # Stale-while-revalidate: answer now, refresh at most once in the background
+                if idDay not in self._refreshing:
+                    self._refreshing.add(idDay)
+                    self._executor.submit(self._background_revalidate, idDay)
+                return cached
+            # Cold miss: only one caller fetches, concurrent callers wait for its result
+            pending = self._pending.get(idDay)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._pending[idDay] = pending
+        metrics.inc("surf_cache_requests_total", cache="forecast", result="miss")
+        if not owner:
+            return pending.result()
+
+        try:
+            entry = self._revalidate(idDay)
+        except Exception as e:
+            if cached is None:
+                pending.set_exception(e)
+                raise
+            # Last known good: an expired forecast beats no forecast
+            logger.warning("Serving expired forecast for idDay %s: %s", idDay, e)
+            entry = cached
+        finally:
+            with self._lock:
+                self._pending.pop(idDay, None)
+        pending.set_result(entry)
+        return entry
+
+    def fetch(self, idDay: int) -> Dict[str, Any]:
+        """Raw IPMA payload for one day"""
+        return self._get_entry(idDay).data
+
+    def fetch_day(self, idDay: int) -> ForecastDay:
+        """Parsed and indexed forecast for one day"""
+        return self._get_entry(idDay).index
+
+    def fetch_many(self, idDays: List[int]) -> Dict[int, Any]:
+        """Fetch several parsed days concurrently; failures are returned as exceptions per day"""
+        # Each worker runs in a copy of the caller's context, so the request deadline carries over
+        futures = {idDay: self._executor.submit(copy_context().run, self.fetch_day, idDay) for idDay in idDays}
+        results = {}
+        for idDay, future in futures.items():
+            try:
+                results[idDay] = future.result()
+            except Exception as e:
+                results[idDay] = e
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+_default_client = ForecastClient()
 
 def fetch_forecast(idDay: int) -> Dict[str, Any]:
     """Fetch forecast for a specific day (1=Saturday, 2=Sunday)."""
-    url = BASE_URL.format(idDay=idDay)
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
-
-def find_spot_data(forecast_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Find Lisbon coast entry."""
-    for entry in forecast_data["data"]:
-        if entry["globalIdLocal"] == TARGET_LOCAL_ID:
-            return entry
-    raise ValueError(f"No data for {TARGET_LOCAL_ID}")
-
-def parse_forecast(raw_data: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+    return _default_client.fetch(idDay)
+
+def find_spot_data(forecast_day: ForecastDay, global_id_local: int = TARGET_LOCAL_ID) -> RegionForecast:
+    """Look up one coastal region (Lisbon coast by default)."""
+    region = forecast_day.regions.get(global_id_local)
+    if region is None:
+        raise ValueError(f"No data for {global_id_local}")
+    return region
+
+def parse_forecast(forecast_day: ForecastDay, region: RegionForecast) -> Dict[str, Any]:
     """Extract parameters with day names."""
-    forecast_date = datetime.strptime(raw_data["forecastDate"], "%Y-%m-%d")
     return {
-        "date": raw_data["forecastDate"],
-        "day_name": forecast_date.strftime("%A").lower(),  # "saturday"/"sunday"
-        "swell_height_min": float(entry["waveHighMin"]),
-        "swell_height_max": float(entry["waveHighMax"]),
-        "swell_period_min": float(entry["wavePeriodMin"]),
-        "swell_period_max": float(entry["wavePeriodMax"]),
-        "primary_wave_direction": entry["predWaveDir"],
-        "sea_surface_temp_min": float(entry["sstMin"]),
-        "sea_surface_temp_max": float(entry["sstMax"])
+        "date": forecast_day.date,
+        "day_name": forecast_day.day_name,  # "saturday"/"sunday"
+        "swell_height_min": region.wave_high_min,
+        "swell_height_max": region.wave_high_max,
+        "swell_period_min": region.wave_period_min,
+        "swell_period_max": region.wave_period_max,
+        "primary_wave_direction": region.pred_wave_dir,
+        "sea_surface_temp_min": region.sst_min,
+        "sea_surface_temp_max": region.sst_max
     }
 
-def get_weekend_forecast() -> dict:
-    """Return forecast with dynamic day names based on actual dates."""
-    weekend_forecast = {}
-    
-    for idDay in [1, 2]:
-        try:
-            raw_data = fetch_forecast(idDay)
-            spot_entry = find_spot_data(raw_data)
-            parsed_data = parse_forecast(raw_data, spot_entry)
-            
-            # Use actual day name from the parsed data as the key
-            day_name = parsed_data["day_name"]
-            weekend_forecast[day_name] = parsed_data
-            
-        except Exception as e:
-            print(f"Error for idDay {idDay}: {str(e)}")
-    
-    return weekend_forecast
\ No newline at end of file
+def get_regional_forecasts(global_ids: List[int]) -> Dict[int, dict]:
+    """
+    Weekend forecasts for several regions, served from the same two downloads.
+    Raises ForecastUnavailable if neither day could be fetched.
+    """
+    forecasts = {global_id: {} for global_id in global_ids}
+
+    # Both days are requested concurrently and usually answered from the cache
+    days = _default_client.fetch_many(WEEKEND_DAYS)
+    failures = [forecast_day for forecast_day in days.values() if isinstance(forecast_day, Exception)]
+    if len(failures) == len(days):
+        raise ForecastUnavailable(f"IPMA forecast unavailable: {failures[0]}") from failures[0]
+    for idDay, forecast_day in days.items():
+        if isinstance(forecast_day, Exception):
+            logger.error("Error for idDay %s: %s", idDay, forecast_day)
+            continue
+        for global_id in global_ids:
+            try:
+                parsed_data = parse_forecast(forecast_day, find_spot_data(forecast_day, global_id))
+                # Use actual day name from the parsed data as the key
+                forecasts[global_id][parsed_data["day_name"]] = parsed_data
+            except Exception as e:
+                logger.error("Error for idDay %s: %s", idDay, e)
+
+    return forecasts
+
+def get_weekend_forecast(global_id_local: int = TARGET_LOCAL_ID) -> dict:
+    """
+    Return forecast with dynamic day names based on actual dates.
+    Raises ForecastUnavailable rather than returning an empty forecast; a day missing from
+    one of the two files is logged and left out.
+    """
+    forecast = get_regional_forecasts([global_id_local])[global_id_local]
+    if not forecast:
+        raise ForecastUnavailable(f"No forecast for region {global_id_local}")
+    return forecast
+
+def region_name(global_id: int) -> str:
+    return "Lisbon coast" if global_id == TARGET_LOCAL_ID else f"IPMA region {global_id}"
+
+def get_spot_regions(spots: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    {spot_id: globalIdLocal of its nearest region}, resolved against Saturday's file (both days
+    cover the same regions). Spots without coordinates, or all spots if that file is unavailable,
+    use the Lisbon coast.
+    """
+    regions = {spot["spot_id"]: TARGET_LOCAL_ID for spot in spots}
+    located = [spot for spot in spots if spot.get("latitude") is not None and spot.get("longitude") is not None]
+    if not located:
+        return regions
+    try:
+        forecast_day = _default_client.fetch_day(WEEKEND_DAYS[0])
+    except Exception as e:
+        logger.error("Error mapping spots to regions: %s", e)
+        return regions
+    for spot in located:
+        region_id = forecast_day.nearest_region(float(spot["latitude"]), float(spot["longitude"]))
+        regions[spot["spot_id"]] = region_id or TARGET_LOCAL_ID
+    return regions
+
+def get_spot_forecasts(spots: List[Dict[str, Any]]) -> Tuple[Dict[str, int], Dict[int, dict]]:
+    """
+    ({spot_id: region}, {region: weekend forecast}) for the spots' nearest regions, served from
+    the same two downloads. Spots whose region has no forecast fall back to the Lisbon coast.
+    """
+    spot_regions = get_spot_regions(spots)
+    forecasts = get_regional_forecasts(sorted(set(spot_regions.values()) | {TARGET_LOCAL_ID}))
+    for spot_id, region_id in spot_regions.items():
+        if not forecasts[region_id]:
+            spot_regions[spot_id] = TARGET_LOCAL_ID
+    return spot_regions, {region_id: forecasts[region_id] for region_id in set(spot_regions.values())}
+
+def get_coast_forecasts() -> Dict[int, dict]:
+    """Weekend forecasts of every region in the files, e.g. to detect any change along the coast"""
+    days = _default_client.fetch_many(WEEKEND_DAYS)
+    region_ids = {
+        region_id
+        for forecast_day in days.values() if not isinstance(forecast_day, Exception)
+        for region_id in forecast_day.regions
+    }
+    return get_regional_forecasts(sorted(region_ids))
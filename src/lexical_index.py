@@ -0,0 +1,158 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "i", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "with", "want", "looking", "some", "spot",
+    "spots", "surf", "surfing", "wave", "waves", "good", "nice", "best",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens with stopwords dropped and a plural "s" stripped"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def matches_filter(meta: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style ``$eq``/range filter against one metadata dict"""
+    if not metadata_filter:
+        return True
+    for field, condition in metadata_filter.items():
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        value = meta.get(field)
+        for op, expected in condition.items():
+            if op == "$eq":
+                if value != expected:
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if not isinstance(value, (int, float)):
+                    return False
+                if ((op == "$gt" and not value > expected) or (op == "$gte" and not value >= expected)
+                        or (op == "$lt" and not value < expected) or (op == "$lte" and not value <= expected)):
+                    return False
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return True
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over spot descriptions, built at ingest time.
+    Stores each spot's metadata so lexical-only results can be returned without the vector index.
+    """
+    def __init__(self,
+                 ids: List[str],
+                 metadata: List[Dict[str, Any]],
+                 postings: Dict[str, List[Tuple[int, int]]],
+                 doc_lengths: List[int],
+                 k1: float = 1.5,
+                 b: float = 0.75):
+        self.ids = ids
+        self.metadata = metadata
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        n = len(ids)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, ids: Sequence[str], metadata: Sequence[Dict[str, Any]],
+              text_field: str = "spot_description") -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for doc, meta in enumerate(metadata):
+            tokens = tokenize(meta.get(text_field, ""))
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc, tf))
+        return cls(list(ids), list(metadata), dict(postings), doc_lengths)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "ids": self.ids,
+                "metadata": self.metadata,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+            }, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as file:
+            stored = json.load(file)
+        postings = {term: [tuple(p) for p in docs] for term, docs in stored["postings"].items()}
+        return cls(stored["ids"], stored["metadata"], postings, stored["doc_lengths"])
+
+    def search(self,
+               query: str,
+               top_k: int = 3,
+               filter: Optional[Dict[str, Any]] = None,
+               confidence_depth: Optional[int] = None) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Pinecone-shaped matches plus a confidence in [0, 1]: the share of query terms
+        present in the weakest of the first confidence_depth (default top_k) documents
+        (1.0 = every one of them has every term).
+        """
+        confidence_depth = min(top_k, confidence_depth or top_k)
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        terms = [term for term in query_terms if term in self.postings]
+        if not terms:
+            return [], 0.0
+
+        scores: Dict[int, float] = defaultdict(float)
+        coverage: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            idf = self.idf[term]
+            for doc, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / self.avg_length)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+                coverage[doc] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        matches = []
+        for doc, score in ranked:
+            if not matches_filter(self.metadata[doc], filter):
+                continue
+            matches.append({"id": self.ids[doc], "score": score, "metadata": self.metadata[doc],
+                            "_coverage": coverage[doc]})
+            if len(matches) == top_k:
+                break
+
+        if len(matches) < confidence_depth:
+            confidence = 0.0  # not enough lexical evidence to fill the request
+        else:
+            # Unknown query words count against confidence too
+            confidence = min(m["_coverage"] for m in matches[:confidence_depth]) / len(query_terms)
+        for match in matches:
+            del match["_coverage"]
+        return matches, confidence
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked match lists; each match scores sum(1 / (k + rank)) over the lists it appears in"""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0,
+                                                   "metadata": match.get("metadata")})
+            entry["score"] += 1.0 / (k + rank)
+            if entry["metadata"] is None:
+                entry["metadata"] = match.get("metadata")
+    return sorted(fused.values(), key=lambda m: m["score"], reverse=True)
@@ -0,0 +1,181 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Union
+from config import RETRIEVAL_TIMEOUT_SECONDS, FORECAST_TIMEOUT_SECONDS, GENERATION_TIMEOUT_SECONDS
+from forecast import get_weekend_forecast, get_spot_forecasts
+from resilience import deadline_scope
+from services import SurfServices, get_services
+from telemetry import metrics, request_trace, span
+
+# With a suitability engine, retrieve this many times top_k and keep the best after reranking
+RERANK_DEPTH = 3
+
+@dataclass
+class PipelineResult:
+    spots: List[Dict[str, Any]] = field(default_factory=list)
+    forecast: Dict[str, Any] = field(default_factory=dict)
+    # Weekend forecast of each spot's nearest region, keyed by the spot's "forecast_region"
+    regional_forecasts: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    report: Optional[str] = None
+    # Seconds per stage ("retrieval", "forecast", "generation", "total")
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Stage name -> error message for stages that failed or missed their deadline
+    errors: Dict[str, str] = field(default_factory=dict)
+
+class SurfReportPipeline:
+    """
+    Runs retrieval and the forecast fetch concurrently, then generation, each under its own deadline.
+    Shared by app.py and batch jobs so they all use the same execution path.
+    """
+    def __init__(self,
+                 services: Optional[SurfServices] = None,
+                 max_workers: int = 8,
+                 retrieval_timeout: float = RETRIEVAL_TIMEOUT_SECONDS,
+                 forecast_timeout: float = FORECAST_TIMEOUT_SECONDS,
+                 generation_timeout: float = GENERATION_TIMEOUT_SECONDS):
+        self.services = services or get_services()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self.retrieval_timeout = retrieval_timeout
+        self.forecast_timeout = forecast_timeout
+        self.generation_timeout = generation_timeout
+
+    @staticmethod
+    def _timed(stage: str, timings: Dict[str, float], timeout: float, fn: Callable, *args, **kwargs):
+        """Run one stage; dependency calls inside it get timeouts derived from its deadline"""
+        start = time.perf_counter()
+        try:
+            with span(stage, profile=True), deadline_scope(timeout):
+                return fn(*args, **kwargs)
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    def _submit(self, *args):
+        # Stages run in a copy of the caller's context so their spans join the request's trace
+        return self.executor.submit(copy_context().run, self._timed, *args)
+
+    def _await(self, stage: str, future, deadline: float, result: PipelineResult, default,
+               reraise: bool = False):
+        """Wait until the stage's absolute deadline; record failures instead of raising unless reraise"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeoutError:
+            result.errors[stage] = "deadline exceeded"
+            metrics.inc("surf_deadline_exceeded_total", stage=stage)
+            if reraise:
+                raise
+        except Exception as e:
+            result.errors[stage] = str(e)
+            if reraise:
+                raise
+        return default
+
+    def prepare(self,
+                user_query: str,
+                preferred_direction: str,
+                preferred_bottom: str,
+                top_k: int = 3,
+                skill_level: Optional[Union[str, int]] = None,
+                raise_retrieval_errors: bool = False) -> PipelineResult:
+        """
+        Retrieve spots and fetch the forecast concurrently, then rerank spots by forecast suitability.
+        With raise_retrieval_errors, a failed retrieval raises its exception (for callers that retry it).
+        """
+        with request_trace("prepare", top_k=top_k):
+            return self._prepare(user_query, preferred_direction, preferred_bottom, top_k, skill_level,
+                                 raise_retrieval_errors)
+
+    def _prepare(self,
+                 user_query: str,
+                 preferred_direction: str,
+                 preferred_bottom: str,
+                 top_k: int,
+                 skill_level: Optional[Union[str, int]],
+                 raise_retrieval_errors: bool = False) -> PipelineResult:
+        result = PipelineResult()
+        start = time.perf_counter()
+        retriever = self.services.retriever()
+        suitability = self.services.suitability
+        candidates = top_k * RERANK_DEPTH if suitability is not None else top_k
+
+        spots_future = self._submit(
+            "retrieval", result.timings, self.retrieval_timeout, retriever.retrieve_spots,
+            user_query, preferred_direction, preferred_bottom, candidates, skill_level
+        )
+        forecast_future = self._submit(
+            "forecast", result.timings, self.forecast_timeout, get_weekend_forecast
+        )
+        result.spots = self._await("retrieval", spots_future, start + self.retrieval_timeout, result, [],
+                                   reraise=raise_retrieval_errors)
+        result.forecast = self._await("forecast", forecast_future, start + self.forecast_timeout, result, {})
+        if result.forecast and result.spots:
+            self._assign_regions(result)
+        if suitability is not None and result.forecast:
+            with span("suitability"):
+                result.spots = suitability.rerank(result.spots, result.forecast, top_k,
+                                                  regional_forecasts=result.regional_forecasts)
+        else:
+            result.spots = result.spots[:top_k]
+        # Only the regions of the spots that were kept
+        regions = {spot.get("forecast_region") for spot in result.spots}
+        result.regional_forecasts = {
+            region_id: forecast for region_id, forecast in result.regional_forecasts.items() if region_id in regions
+        }
+        result.timings["total"] = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _assign_regions(result: PipelineResult) -> None:
+        """Tag each spot with its nearest forecast region; the files are already cached by the forecast stage"""
+        try:
+            with span("spot_forecasts"):
+                spot_regions, result.regional_forecasts = get_spot_forecasts(result.spots)
+        except Exception as e:
+            result.errors["spot_forecasts"] = str(e)  # every spot keeps the default forecast
+            return
+        for spot in result.spots:
+            spot["forecast_region"] = spot_regions[spot["spot_id"]]
+
+    def run(self,
+            user_query: str,
+            preferred_direction: str,
+            preferred_bottom: str,
+            top_k: int = 3,
+            generation_model: str = 'gpt-4o',
+            temperature: float = 0.3,
+            skill_level: Optional[Union[str, int]] = None) -> PipelineResult:
+        """Full request: concurrent retrieval + forecast, then report generation"""
+        with request_trace("report", model=generation_model, top_k=top_k) as root:
+            result = self._run(user_query, preferred_direction, preferred_bottom, top_k,
+                               generation_model, temperature, skill_level)
+            root.attributes["errors"] = sorted(result.errors)
+            return result
+
+    def _run(self,
+             user_query: str,
+             preferred_direction: str,
+             preferred_bottom: str,
+             top_k: int,
+             generation_model: str,
+             temperature: float,
+             skill_level: Optional[Union[str, int]]) -> PipelineResult:
+        start = time.perf_counter()
+        result = self.prepare(user_query, preferred_direction, preferred_bottom, top_k, skill_level)
+        if "retrieval" in result.errors:
+            # No spots to report on; a forecast-only failure still yields a report
+            result.timings["total"] = time.perf_counter() - start
+            return result
+
+        generator = self.services.report_generator(
+            result.spots, result.forecast, generation_model, temperature,
+            regional_forecasts=result.regional_forecasts
+        )
+        report_future = self._submit(
+            "generation", result.timings, self.generation_timeout, generator.generate_report, user_query
+        )
+        result.report = self._await(
+            "generation", report_future, time.perf_counter() + self.generation_timeout, result, None
+        )
+        result.timings["total"] = time.perf_counter() - start
+        return result
@@ -0,0 +1,176 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from itertools import product
+from typing import List, Dict, Any, Optional, Union
+from cache import TwoTierCache
+from config import (PRECOMPUTE_INTERVAL_SECONDS, PRECOMPUTE_TOP_KS, PRECOMPUTE_MODEL, PRECOMPUTE_TEMPERATURE,
+                    PRECOMPUTED_REPORTS_PATH)
+from embedding_cache import normalize_text
+from forecast import get_weekend_forecast, get_coast_forecasts, ForecastUnavailable, WEEKEND_DAYS
+from pipeline import SurfReportPipeline
+from report_cache import fingerprint
+from services import DEFAULT_QUERY
+from spot_attributes import WAVE_DIRECTIONS, BOTTOM_TYPES
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# Polls the forecast and pregenerates the default-query reports whenever it changes.
+# Runs inside app.py, or standalone (sharing the on-disk store) with:
+#   PYTHONPATH=src python src/precompute.py
+
+def coast_fingerprint() -> str:
+    """Fingerprint of every region's forecast: spots are described with their nearest region's"""
+    return fingerprint(get_coast_forecasts())
+
+class PrecomputedReports:
+    """Pipeline results for the default query, keyed by forecast and filter combination"""
+    def __init__(self, cache: TwoTierCache):
+        self.cache = cache
+
+    @staticmethod
+    def key(forecast_fingerprint: str, direction: str, bottom: str, top_k: int,
+            model: str, temperature: float) -> str:
+        return fingerprint([forecast_fingerprint, direction, bottom, top_k, model, temperature])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.cache.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.cache.set(key, json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8"))
+
+class ForecastRefresher:
+    """
+    Background thread that polls the forecast and, when the forecast of any region
+    changes, runs the full pipeline for every direction x bottom x top_k combination.
+    The UI looks results up with `lookup` and only generates live for custom requests.
+    """
+    def __init__(self,
+                 pipeline: SurfReportPipeline,
+                 store: Optional[PrecomputedReports] = None,
+                 interval: float = PRECOMPUTE_INTERVAL_SECONDS,
+                 top_ks: List[int] = PRECOMPUTE_TOP_KS,
+                 generation_model: str = PRECOMPUTE_MODEL,
+                 temperature: float = PRECOMPUTE_TEMPERATURE,
+                 query: str = DEFAULT_QUERY,
+                 concurrency: int = 4):
+        self.pipeline = pipeline
+        self.store = store or PrecomputedReports(TwoTierCache(PRECOMPUTED_REPORTS_PATH or None))
+        self.interval = interval
+        self.top_ks = list(top_ks)
+        self.model = generation_model
+        self.temperature = temperature
+        self.query = query
+        self.concurrency = concurrency
+        self.forecast_fingerprint: Optional[str] = None
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def combinations(self):
+        return product(WAVE_DIRECTIONS, BOTTOM_TYPES, self.top_ks)
+
+    def _precompute(self, forecast_fingerprint: str, force: bool, direction: str, bottom: str, top_k: int) -> bool:
+        key = self.store.key(forecast_fingerprint, direction, bottom, top_k, self.model, self.temperature)
+        if not force and self.store.get(key) is not None:
+            return True  # e.g. stored by another process, or before a restart
+        result = self.pipeline.run(self.query, direction, bottom, top_k, self.model, self.temperature)
+        if result.errors or not result.report:
+            logger.warning("Precompute of %s/%s/top_k=%s failed: %s", direction, bottom, top_k, result.errors)
+            return False
+        # Keyed on the forecast the report was built from, which may be newer than the one polled
+        key = self.store.key(coast_fingerprint(), direction, bottom, top_k, self.model, self.temperature)
+        entry = asdict(result)
+        entry["generated_at"] = time.time()
+        self.store.set(key, entry)
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """Regenerate every combination if the forecast changed; True if it did"""
+        try:
+            forecast = get_weekend_forecast()
+        except ForecastUnavailable as e:
+            logger.warning("Keeping the previous reports, no forecast: %s", e)
+            return False
+        if len(forecast) < len(WEEKEND_DAYS):
+            # A partial forecast would replace complete reports with worse ones until the next change
+            logger.warning("Keeping the previous reports, forecast only has %s", ", ".join(forecast))
+            return False
+        current = coast_fingerprint()
+        if current == self.forecast_fingerprint and not force:
+            return False
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            done = list(executor.map(lambda combo: self._precompute(current, force, *combo), self.combinations()))
+        self.refreshes += 1
+        # Remember the forecast only once it is fully covered, so failures are retried next poll
+        if all(done):
+            self.forecast_fingerprint = current
+        logger.info("Precomputed %d/%d reports in %.1fs", sum(done), len(done), time.perf_counter() - start)
+        return True
+
+    def lookup(self,
+               user_query: str,
+               preferred_direction: str,
+               preferred_bottom: str,
+               top_k: int,
+               generation_model: str,
+               temperature: float,
+               skill_level: Optional[Union[str, int]] = None) -> Optional[Dict[str, Any]]:
+        """Precomputed PipelineResult fields for this request under the current forecast, or None"""
+        if (skill_level is not None or normalize_text(user_query) != normalize_text(self.query)
+                or generation_model != self.model or temperature != self.temperature
+                or top_k not in self.top_ks):
+            return None
+        try:
+            current = coast_fingerprint()
+        except ForecastUnavailable:
+            return None  # generated live, where the pipeline records the forecast error
+        key = self.store.key(current, preferred_direction, preferred_bottom,
+                             top_k, generation_model, temperature)
+        entry = self.store.get(key)
+        metrics.inc("surf_cache_requests_total", cache="precomputed", result="miss" if entry is None else "hit")
+        return entry
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.exception("Forecast refresh failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self) -> "ForecastRefresher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="forecast-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pregenerate default-query reports whenever the forecast changes.")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit instead of polling")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the forecast is unchanged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    refresher = ForecastRefresher(SurfReportPipeline())
+    if args.once:
+        refresher.refresh(force=args.force)
+    else:
+        if args.force:
+            refresher.refresh(force=True)
+        try:
+            refresher.start()._thread.join()
+        except KeyboardInterrupt:
+            refresher.stop()
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Any, Optional
+from cache import TwoTierCache
+from config import REPORT_CACHE_PATH, REPORT_CACHE_MEMORY_ITEMS, REPORT_CACHE_DISK_ITEMS
+
+def fingerprint(value: Any) -> str:
+    """Stable hash of any JSON-serialisable value"""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ReportCache:
+    """
+    Generated reports keyed on the full request (prompt, model, temperature, max_tokens).
+    Keys also carry the forecast fingerprint, so a new forecast misses and reports built from older
+    ones age out through LRU eviction; nothing is cleared, as other workers sharing the disk tier
+    may still be serving them.
+    """
+    def __init__(self, cache: TwoTierCache):
+        self.cache = cache
+
+    def key(self, forecast: Dict, call_kwargs: Dict[str, Any]) -> str:
+        return fingerprint({"forecast": fingerprint(forecast), "request": call_kwargs})
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.cache.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, report: str) -> None:
+        self.cache.set(key, report.encode("utf-8"))
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+_shared_cache: Optional[ReportCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_report_cache() -> ReportCache:
+    """Process-wide report cache shared by every SurfReportGenerator"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ReportCache(TwoTierCache(
+                    REPORT_CACHE_PATH or None,
+                    max_memory_items=REPORT_CACHE_MEMORY_ITEMS,
+                    max_disk_items=REPORT_CACHE_DISK_ITEMS
+                ))
+    return _shared_cache
@@ -1,6 +1,19 @@
-from typing import List, Dict, Any
-from openai import OpenAI
-from config import OPENAI_API_KEY
+import time
+from typing import List, Dict, Any, Iterator, Optional, TYPE_CHECKING
+from config import OPENAI_API_KEY, PROMPT_DESCRIPTION_TOKENS
+from forecast import TARGET_LOCAL_ID, region_name
+from report_cache import get_report_cache, fingerprint
+from token_budget import count_tokens, pack_descriptions
+from resilience import get_dependency
+from telemetry import metrics, span
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+def create_openai_client() -> "OpenAI":
+    # The SDK is imported on first use: it is slow to import and cached reports never need it
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
 
 class SurfReportGenerator:
     def __init__(
@@ -9,66 +22,96 @@ class SurfReportGenerator:
         forecast: Dict,
         generation_model: str = 'gpt-4o',
         temperature: float = 0.3,
-        max_tokens: int = 1500
+        max_tokens: int = 1500,
+        use_cache: bool = True,
+        client: Optional["OpenAI"] = None,
+        description_tokens: int = PROMPT_DESCRIPTION_TOKENS,
+        regional_forecasts: Optional[Dict[int, Dict]] = None
     ):
         self.spots = spots
         self.forecast = forecast
+        # Forecast of each spot's region, keyed by spot["forecast_region"]; without it every spot
+        # is described with `forecast`
+        self.regional_forecasts = regional_forecasts or {}
         self.model = generation_model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-
-    def _format_spot_info(self, spot: Dict) -> str:
-        return (
-            f"Spot: {spot['name']}\n"
-            f"Description: {spot['description'][:200]}...\n"
-            f"Surf Level: {spot['surf_level']}\n"
-            f"Crowd Factor: {spot['crowd_factor']}\n"
-            f"Wave Size: {self._get_wave_size(spot['name'])}\n"
-            f"Water Temp: {self._get_water_temp()}\n"
-            f"Best Tide: {self._extract_tide_info(spot['description'])}"
-        )
+        self.description_tokens = description_tokens
+        self.client = client if client is not None else create_openai_client()
+        self.cache = get_report_cache() if use_cache else None
+        # Generation is bounded by the request deadline and a circuit breaker, never hedged
+        self.dependency = get_dependency("openai")
+        # Latency of the most recent generation, in seconds
+        self.last_timings: Dict[str, float] = {}
+        # Token counts of the most recent prompt ("forecast", "spots", "total"); estimated without tiktoken
+        self.prompt_tokens: Dict[str, int] = {}
+        # "General Forecast Overview", rendered on first use: request_key and generation both need it
+        self._forecast_text: Optional[str] = None
 
-    def _get_wave_size(self, spot_name: str) -> str:
-        sizes = []
-        for day in ['saturday', 'sunday']:
-            if day in self.forecast:
-                d = self.forecast[day]
-                sizes.append(f"{day.capitalize()}: {d['swell_height_min']}-{d['swell_height_max']}m")
-        return " | ".join(sizes)
-
-    def _get_water_temp(self) -> str:
-        temps = []
-        for day in ['saturday', 'sunday']:
-            if day in self.forecast:
-                d = self.forecast[day]
-                temps.append(f"{d['sea_surface_temp_min']}-{d['sea_surface_temp_max']}°C")
-        return "/".join(sorted(set(temps)))
+    def _format_spot_info(self, spot: Dict, description: str) -> str:
+        # Forecast-wide wave and temperature figures live in the overview, not in every spot
+        lines = [
+            f"Spot: {spot['name']}",
+            f"Description: {description}",
+            f"Surf Level: {spot['surf_level']}",
+            f"Crowd Factor: {spot['crowd_factor']}",
+        ]
+        if len(self.regional_forecasts) > 1 and spot.get("forecast_region") in self.regional_forecasts:
+            lines.append(f"Forecast Region: {region_name(spot['forecast_region'])}")
+        swell_window = self._get_swell_window(spot)
+        if swell_window:
+            lines.append(f"Swell Window: {swell_window}")
+        if spot.get("suitability") is not None:
+            lines.append(f"Forecast Match: {spot['suitability'] * 10:.1f}/10")
+        lines.append(f"Best Tide: {self._extract_tide_info(spot['description'])}")
+        return "\n".join(lines)
+
+    def _get_swell_window(self, spot: Dict) -> str:
+        """The spot's own working conditions, so the model can judge whether the forecast suits it"""
+        if not spot.get("swell_size"):
+            return ""
+        if spot.get("best_swell_direction"):
+            return f"{spot['swell_size']} from {spot['best_swell_direction']}"
+        return spot["swell_size"]
 
     def _extract_tide_info(self, description: str) -> str:
         tide_keywords = {'low tide':'Low', 'mid tide':'Mid', 'high tide':'High'}
         found = {label for kw,label in tide_keywords.items() if kw in description.lower()}
         return ", ".join(sorted(found)) or "Not specified"
 
+    @staticmethod
+    def _format_days(forecast: Dict) -> str:
+        return "".join(
+            f"{day.capitalize()}:\n"
+            f"- Wave Height: {data['swell_height_min']}-{data['swell_height_max']}m\n"
+            f"- Swell Period: {data['swell_period_min']}-{data['swell_period_max']}s\n"
+            f"- Swell Direction: {data['primary_wave_direction']}\n"
+            f"- Water Temp: {data['sea_surface_temp_min']}-{data['sea_surface_temp_max']}°C\n\n"
+            for day, data in forecast.items()
+        )
+
     def _format_forecast(self) -> str:
-        txt = "General Forecast Overview:\n"
-        for day,data in self.forecast.items():
-            txt += (
-                f"{day.capitalize()}:\n"
-                f"- Wave Height: {data['swell_height_min']}-{data['swell_height_max']}m\n"
-                f"- Swell Period: {data['swell_period_min']}-{data['swell_period_max']}s\n"
-                f"- Swell Direction: {data['primary_wave_direction']}\n"
-                f"- Water Temp: {data['sea_surface_temp_min']}-{data['sea_surface_temp_max']}°C\n\n"
-            )
-        return txt
+        if self._forecast_text is None:
+            regions = self.regional_forecasts or {TARGET_LOCAL_ID: self.forecast}
+            if len(regions) == 1:
+                text = "General Forecast Overview:\n" + self._format_days(next(iter(regions.values())))
+            else:
+                # One block per region the spots are in; each spot names its region
+                text = "General Forecast Overview:\n" + "".join(
+                    f"{region_name(region_id)}:\n" + self._format_days(forecast)
+                    for region_id, forecast in sorted(regions.items())
+                )
+            self._forecast_text = text
+        return self._forecast_text
 
     def _build_merged_spot_details(self) -> str:
-        details = "Surf Spot Details:\n"
-        for spot in self.spots:
-            details += self._format_spot_info(spot) + "\n\n"
-        return details.strip()
+        descriptions = pack_descriptions(
+            [spot["description"] for spot in self.spots], self.description_tokens, self.model
+        )
+        details = [self._format_spot_info(spot, description) for spot, description in zip(self.spots, descriptions)]
+        return "Surf Spot Details:\n" + "\n\n".join(details)
 
-    def generate_report(self, user_query: str) -> str:
+    def _build_prompt(self, user_query: str) -> str:
         forecast_text = self._format_forecast()
         spot_text = self._build_merged_spot_details()
 
@@ -84,6 +127,15 @@ class SurfReportGenerator:
             "Pay close attention to faithfulness, answer relevancy, and context relevancy.\n\n"
             f"User Query: {user_query}"
         )
+        self.prompt_tokens = {
+            "forecast": count_tokens(forecast_text, self.model),
+            "spots": count_tokens(spot_text, self.model),
+            "total": count_tokens(prompt, self.model) + count_tokens(user_query, self.model),
+        }
+        return prompt
+
+    def _build_call_kwargs(self, user_query: str) -> Dict[str, Any]:
+        prompt = self._build_prompt(user_query)
 
         # Build the two “messages” for the OpenAI call
         role0 = "system" if self.model.startswith("gpt-4") else "developer"
@@ -108,12 +160,103 @@ class SurfReportGenerator:
                 "max_output_tokens": self.max_tokens,
                 "top_p": 1,
             })
+        return call_kwargs
+
+    def _request_identity(self, call_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # o3-mini requests omit temperature/max tokens, so key on them explicitly
+        return {
+            "request": call_kwargs,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
 
-        resp = self.client.responses.create(**call_kwargs)
+    def _cache_key(self, call_kwargs: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(self.forecast, self._request_identity(call_kwargs))
+
+    def request_key(self, user_query: str) -> str:
+        """Identical for any two generators that would send the same request (used to dedupe batches)"""
+        return fingerprint(self._request_identity(self._build_call_kwargs(user_query)))
+
+    def _cached_report(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        metrics.inc("surf_cache_requests_total", cache="reports", result="miss" if cached is None else "hit")
+        return cached
+
+    def _record_usage(self, usage) -> None:
+        """Count the tokens reported in a Responses API `usage` object"""
+        if usage is None:
+            return
+        for kind in ("input_tokens", "output_tokens"):
+            count = getattr(usage, kind, None)
+            if count:
+                metrics.inc("surf_openai_tokens_total", count, model=self.model, kind=kind[:-len("_tokens")])
+
+    def generate_report(self, user_query: str) -> str:
+        call_kwargs = self._build_call_kwargs(user_query)
+
+        start = time.perf_counter()
+        cache_key = self._cache_key(call_kwargs)
+        cached = self._cached_report(cache_key)
+        if cached is not None:
+            total = time.perf_counter() - start
+            self.last_timings = {"time_to_first_token": total, "total": total, "cached": True}
+            return cached
+
+        with span("openai", model=self.model, prompt_tokens=self.prompt_tokens.get("total")):
+            resp = self.dependency.call(self.client.responses.create, **call_kwargs)
+        self._record_usage(getattr(resp, "usage", None))
+        total = time.perf_counter() - start
+        # Nothing is visible before the whole response arrives
+        self.last_timings = {"time_to_first_token": total, "total": total}
 
         # Extract the assistant’s text from resp.output
+        report = ""
         for item in resp.output:
             if getattr(item, "type", None) == "message":
-                return "".join(c.text for c in item.content)
+                report = "".join(c.text for c in item.content)
+                break
+
+        if cache_key is not None and report:
+            self.cache.set(cache_key, report)
+        return report
+
+    def generate_report_stream(self, user_query: str) -> Iterator[str]:
+        """Yield the report as text deltas; joined, they equal generate_report's result"""
+        call_kwargs = self._build_call_kwargs(user_query)
+
+        start = time.perf_counter()
+        self.last_timings = {}
+        cache_key = self._cache_key(call_kwargs)
+        cached = self._cached_report(cache_key)
+        if cached is not None:
+            total = time.perf_counter() - start
+            self.last_timings = {"time_to_first_token": total, "total": total, "cached": True}
+            yield cached
+            return
+
+        chunks = []
+        # The span covers opening the stream; the full duration is recorded as "openai_stream" below
+        with span("openai", model=self.model, prompt_tokens=self.prompt_tokens.get("total"), stream=True):
+            stream = self.dependency.call(self.client.responses.create, **call_kwargs, stream=True)
+        for event in stream:
+            event_type = getattr(event, "type", None)
+            if event_type == "response.output_text.delta":
+                if "time_to_first_token" not in self.last_timings:
+                    self.last_timings["time_to_first_token"] = time.perf_counter() - start
+                chunks.append(event.delta)
+                yield event.delta
+            elif event_type == "response.completed":
+                self._record_usage(getattr(getattr(event, "response", None), "usage", None))
+            elif event_type in ("response.failed", "error"):
+                raise RuntimeError(f"Report generation failed: {event}")
 
-        return ""
+        self.last_timings["total"] = time.perf_counter() - start
+        self.last_timings.setdefault("time_to_first_token", self.last_timings["total"])
+        metrics.observe("surf_stage_seconds", self.last_timings["total"], stage="openai_stream")
+        # Only a fully received report is cached
+        if cache_key is not None and chunks:
+            self.cache.set(cache_key, "".join(chunks))
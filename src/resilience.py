@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Callable, Hashable
+from config import (RESILIENCE_ENABLED, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS,
+                    IPMA_TIMEOUT_SECONDS, IPMA_HEDGE_SECONDS, EMBEDDING_TIMEOUT_SECONDS, EMBEDDING_HEDGE_SECONDS,
+                    INDEX_TIMEOUT_SECONDS, INDEX_HEDGE_SECONDS, GENERATION_TIMEOUT_SECONDS)
+from telemetry import metrics
+
+class DependencyError(RuntimeError):
+    """A dependency call failed fast or ran out of time"""
+
+class CircuitOpenError(DependencyError):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds until the breaker lets a trial call through
+
+class DeadlineExceeded(DependencyError):
+    pass
+
+# Absolute time.monotonic() by which the current request must finish, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Run the block under a deadline `seconds` from now (never later than an enclosing one)"""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_left(cap: float) -> float:
+    """Seconds a call may take: the dependency's own cap, shortened by the request deadline"""
+    at = _deadline.get()
+    if at is None:
+        return cap
+    left = at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("request deadline already passed")
+    return min(cap, left)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds, then lets a single trial call through (half-open) before closing again.
+    """
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker goes half-open (0 if it is not open)"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+class Dependency:
+    """
+    Wraps calls to one external service with:
+    - a timeout capped by the request deadline (see deadline_scope);
+    - for idempotent reads, a hedged duplicate after `hedge_after` seconds and a retry on failure;
+    - a circuit breaker;
+    - last-known-good results, when the caller passes a fallback_key.
+    Calls run on the dependency's own threads so a hung client cannot block the caller past its budget.
+    """
+    def __init__(self,
+                 name: str,
+                 timeout: float,
+                 hedge_after: Optional[float] = None,
+                 max_attempts: int = 2,
+                 breaker: Optional[CircuitBreaker] = None,
+                 max_workers: int = 32,
+                 fallback_items: int = 256):
+        self.name = name
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self.enabled = RESILIENCE_ENABLED
+        self.fallback_items = fallback_items
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._last_good: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"calls": 0, "hedges": 0, "retries": 0, "failures": 0,
+                                      "rejected": 0, "fallbacks": 0}
+
+    def _count(self, event: str) -> None:
+        self.stats[event] += 1
+        metrics.inc("surf_dependency_events_total", dependency=self.name, event=event)
+
+    def call(self, fn: Callable, *args, idempotent: bool = False, fallback_key: Optional[Hashable] = None,
+             **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        try:
+            result = self._call(fn, args, kwargs, idempotent)
+        except Exception:
+            if fallback_key is not None:
+                with self._lock:
+                    if fallback_key in self._last_good:
+                        self._count("fallbacks")
+                        return self._last_good[fallback_key]
+            raise
+        if fallback_key is not None:
+            with self._lock:
+                self._last_good[fallback_key] = result
+                self._last_good.move_to_end(fallback_key)
+                if len(self._last_good) > self.fallback_items:
+                    self._last_good.popitem(last=False)
+        return result
+
+    def _call(self, fn: Callable, args, kwargs, idempotent: bool):
+        budget = time_left(self.timeout)
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)", self.breaker.retry_after())
+        self._count("calls")
+        end = time.monotonic() + budget
+        attempts = self.max_attempts if idempotent else 1
+        pending = {self._executor.submit(fn, *args, **kwargs)}
+        submitted = 1
+        last_error: Optional[Exception] = None
+
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = self.hedge_after is not None and submitted < attempts
+            done, pending = wait(pending, timeout=min(remaining, self.hedge_after) if can_hedge else remaining,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                else:
+                    self.breaker.record_success()
+                    return result
+            if submitted < attempts and (not pending or can_hedge):
+                # Retry after a failure, or hedge a read that is slower than usual
+                self._count("retries" if done else "hedges")
+                pending.add(self._executor.submit(fn, *args, **kwargs))
+                submitted += 1
+
+        self._count("failures")
+        self.breaker.record_failure()
+        if not pending and last_error is not None:
+            raise last_error
+        raise DeadlineExceeded(f"{self.name} did not answer within {budget:.2f}s")
+
+_dependencies: Dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+# Per-service timeout cap and hedge delay; generation is neither hedged nor retried
+_POLICIES = {
+    "ipma": {"timeout": IPMA_TIMEOUT_SECONDS, "hedge_after": IPMA_HEDGE_SECONDS},
+    "embeddings": {"timeout": EMBEDDING_TIMEOUT_SECONDS, "hedge_after": EMBEDDING_HEDGE_SECONDS},
+    "vector_index": {"timeout": INDEX_TIMEOUT_SECONDS, "hedge_after": INDEX_HEDGE_SECONDS},
+    "openai": {"timeout": GENERATION_TIMEOUT_SECONDS, "hedge_after": None, "max_attempts": 1},
+}
+
+def get_dependency(name: str) -> Dependency:
+    """Process-wide Dependency for "ipma", "embeddings", "vector_index" or "openai" """
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        with _dependencies_lock:
+            dependency = _dependencies.get(name)
+            if dependency is None:
+                dependency = Dependency(name, **_POLICIES[name])
+                _dependencies[name] = dependency
+    return dependency
+
+def dependency_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: dict(dep.stats, state=dep.breaker.state) for name, dep in _dependencies.items()}
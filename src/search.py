@@ -1,73 +1,184 @@
-from pinecone import Pinecone
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from config import PINECONE_API_KEY, GOOGLE_API_KEY
-from typing import List, Dict, Any
+from config import (PINECONE_API_KEY, GOOGLE_API_KEY, VECTOR_BACKEND, LOCAL_INDEX_PATH, EMBEDDING_MODEL,
+                    RETRIEVAL_MODE, LEXICAL_INDEX_PATH, LEXICAL_CONFIDENCE, FUSION_DEPTH)
+from vector_index import LocalVectorIndex
+from embedding_cache import CachedEmbeddings, normalize_text
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from spot_attributes import skill_index, surf_level_label, crowd_label
+from report_cache import fingerprint
+from resilience import get_dependency
+from telemetry import metrics, span
+from typing import List, Dict, Any, Optional, Union
+import os
 import re
 
-class SurfSpotRetriever:
-    def __init__(self):
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
+# Provider SDKs are imported inside the factories: they are slow to import,
+# and a process only pays for them once it actually builds a client.
+
+def create_embeddings() -> CachedEmbeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    # Repeat queries are served from the shared embedding cache
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
             google_api_key=GOOGLE_API_KEY
-        )
-        self.pinecone = Pinecone(api_key=PINECONE_API_KEY)
-        self.index = self.pinecone.Index("surfspots")
+        ),
+        EMBEDDING_MODEL
+    )
+
+def create_index(backend: str):
+    if backend == "local":
+        # Same query API as Pinecone, served from a memory-mapped matrix
+        return LocalVectorIndex(LOCAL_INDEX_PATH)
+    if backend == "pinecone":
+        from pinecone import Pinecone
+        return Pinecone(api_key=PINECONE_API_KEY).Index("surfspots")
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+def create_lexical_index() -> Optional[BM25Index]:
+    # Built by pinecone_setup.py; without it retrieval is vector-only
+    if LEXICAL_INDEX_PATH and os.path.exists(LEXICAL_INDEX_PATH):
+        return BM25Index.load(LEXICAL_INDEX_PATH)
+    return None
+
+class SurfSpotRetriever:
+    def __init__(self, backend: Optional[str] = None, embeddings=None, index=None,
+                 lexical_index=None, mode: Optional[str] = None):
+        """Pass embeddings/index/lexical_index to reuse long-lived clients (see services.py)"""
+        self.embeddings = embeddings if embeddings is not None else create_embeddings()
+        self.backend = backend or VECTOR_BACKEND
+        self.index = index if index is not None else create_index(self.backend)
+        self.mode = mode or RETRIEVAL_MODE
+        if self.mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {self.mode}")
+        self.lexical_index = lexical_index
+        if self.lexical_index is None and self.mode == "hybrid":
+            self.lexical_index = create_lexical_index()
+        # Which path served the last query: "vector", "hybrid", "lexical" or "lexical-fallback"
+        self.last_path: Optional[str] = None
+        self.embedding_dependency = get_dependency("embeddings")
+        self.index_dependency = get_dependency("vector_index")
     
     def _build_metadata_filter(self, 
                                preferred_direction: str, 
-                               preferred_bottom: str) -> Dict[str, Any]:
-        """Use EXACT MATCH filtering"""
+                               preferred_bottom: str,
+                               skill_level: Optional[Union[str, int]] = None) -> Dict[str, Any]:
+        """Use EXACT MATCH filtering, plus a range match on the ingest-time surf level"""
         
-        return {
+        metadata_filter = {
             "direction_of_wave": {"$eq": preferred_direction.strip().capitalize()},
             "type_of_bottom": {"$eq": preferred_bottom.strip().capitalize()}
         }
+        if skill_level is not None:
+            level = skill_index(skill_level)
+            metadata_filter["surf_level_min"] = {"$lte": level}
+            metadata_filter["surf_level_max"] = {"$gte": level}
+        return metadata_filter
 
     def retrieve_spots(self,
                       user_query: str,
                       preferred_direction: str,
                       preferred_bottom: str,
-                      top_k: int = 3) -> List[Dict[str, Any]]:
+                      top_k: int = 3,
+                      skill_level: Optional[Union[str, int]] = None) -> List[Dict[str, Any]]:
         """
         Combined metadata filtering and semantic search
-        Returns sorted list of spots with relevance scores
+        Returns sorted list of spots. relevance_score is the cosine similarity (None for spots found
+        only by keyword); retrieval_score is the score they were ranked by on the path taken
+        (cosine, BM25 or reciprocal-rank fusion).
         """
-        # Generate embedding for the user's free-text query
-        query_embedding = self.embeddings.embed_query(user_query)
-        
         # Build metadata filter with partial matching
         metadata_filter = self._build_metadata_filter(
             preferred_direction, 
-            preferred_bottom
+            preferred_bottom,
+            skill_level
         )
-        
-        # Execute Pinecone query
-        results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            filter=metadata_filter,
-            include_metadata=True
-        )
-        
-        # Process and format results
-        return self._format_results(results["matches"])
 
-    def _format_results(self, matches: List[Dict]) -> List[Dict[str, Any]]:
+        lexical_matches = []
+        candidates = top_k
+        if self.mode == "hybrid" and self.lexical_index is not None:
+            # Fuse from a fixed-depth candidate list, independent of top_k up to FUSION_DEPTH
+            candidates = max(FUSION_DEPTH, top_k)
+            with span("lexical_search"):
+                lexical_matches, confidence = self.lexical_index.search(
+                    user_query, candidates, metadata_filter, confidence_depth=top_k
+                )
+            # Keyword queries confidently answered by their top_k BM25 hits skip the embedding call
+            if confidence >= LEXICAL_CONFIDENCE:
+                return self._finish("lexical", lexical_matches[:top_k])
+
+        try:
+            # Generate embedding for the user's free-text query
+            with span("embedding"):
+                query_embedding = self.embedding_dependency.call(
+                    self.embeddings.embed_query, user_query, idempotent=True
+                )
+
+            # Execute vector query (Pinecone or local index); the last good answer covers outages
+            with span("vector_query", backend=self.backend, top_k=candidates):
+                results = self.index_dependency.call(
+                    self.index.query,
+                    vector=query_embedding,
+                    top_k=candidates,
+                    filter=metadata_filter,
+                    include_metadata=True,
+                    idempotent=True,
+                    fallback_key=fingerprint([normalize_text(user_query), metadata_filter, candidates])
+                )
+        except Exception:
+            if not lexical_matches:
+                raise
+            # Degrade to keyword results rather than failing the request
+            return self._finish("lexical-fallback", lexical_matches[:top_k])
+
+        vector_matches = [
+            {"id": m["id"], "score": m["score"], "metadata": m["metadata"]} for m in results["matches"]
+        ]
+        cosine = {m["id"]: m["score"] for m in vector_matches}
+        if not lexical_matches:
+            return self._finish("vector", vector_matches[:top_k], cosine)
+
+        # Reciprocal-rank fusion of the lexical and vector rankings
+        fused = reciprocal_rank_fusion([vector_matches, lexical_matches])
+        return self._finish("hybrid", fused[:top_k], cosine)
+
+    def _finish(self, path: str, matches: List[Dict],
+                cosine: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        self.last_path = path
+        metrics.inc("surf_retrieval_path_total", path=path)
+        return self._format_results(matches, cosine or {})
+
+    def _format_results(self, matches: List[Dict], cosine: Dict[str, float]) -> List[Dict[str, Any]]:
         """Standardize result format and add calculated fields"""
         formatted = []
         for match in matches:
             meta = match["metadata"]
-            formatted.append({
+            spot = {
                 "spot_id": match["id"],
                 "name": meta["name"],
                 "description": meta["spot_description"],
                 "wave_direction": meta["direction_of_wave"],
                 "bottom_type": meta["type_of_bottom"],
-                "relevance_score": match["score"],
-                "surf_level": self._extract_surf_level(meta["spot_description"]),
-                "crowd_factor": self._extract_crowd_info(meta["spot_description"])
-            })
-        return sorted(formatted, key=lambda x: x["relevance_score"], reverse=True)
+                "relevance_score": cosine.get(match["id"]),
+                "retrieval_score": match["score"],
+                "surf_level_min": meta.get("surf_level_min"),
+                "surf_level_max": meta.get("surf_level_max"),
+                "crowd_score": meta.get("crowd_score"),
+                "best_swell_direction": meta.get("best_swell_direction"),
+                "swell_size": meta.get("swell_size"),
+                "latitude": meta.get("latitude"),
+                "longitude": meta.get("longitude"),
+            }
+            # Typed fields are set at ingest time; parse the text only for older index entries
+            if spot["surf_level_min"] is not None and spot["surf_level_max"] is not None:
+                spot["surf_level"] = surf_level_label(spot["surf_level_min"], spot["surf_level_max"])
+            else:
+                spot["surf_level"] = self._extract_surf_level(meta["spot_description"])
+            if spot["crowd_score"] is not None:
+                spot["crowd_factor"] = crowd_label(spot["crowd_score"])
+            else:
+                spot["crowd_factor"] = self._extract_crowd_info(meta["spot_description"])
+            formatted.append(spot)
+        return sorted(formatted, key=lambda x: x["retrieval_score"], reverse=True)
 
     def _extract_surf_level(self, description: str) -> str:
         """Parse surf level with support for ranges and multiple skill levels"""
@@ -0,0 +1,132 @@
+import logging
+import threading
+from typing import List, Dict, Optional, TYPE_CHECKING
+from config import VECTOR_BACKEND
+from forecast import get_weekend_forecast
+from search import SurfSpotRetriever, create_embeddings, create_index, create_lexical_index
+from report_generator import SurfReportGenerator, create_openai_client
+from suitability import SuitabilityEngine, create_suitability_engine
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY = "Fun right-handers with reef bottom"
+
+class SurfServices:
+    """
+    Long-lived, thread-safe clients shared by every request in the process.
+    Each client is built once on first use (or by warmup) instead of on every click.
+    """
+    def __init__(self, backend: Optional[str] = None, embeddings=None, index=None, openai_client=None,
+                 suitability: Optional[SuitabilityEngine] = None):
+        """Clients passed in (e.g. local stand-ins for benchmarks) are used instead of building real ones"""
+        self.backend = backend or VECTOR_BACKEND
+        self._lock = threading.Lock()
+        self._embeddings = embeddings
+        self._index = index
+        self._openai = openai_client
+        self._lexical_index = None
+        self._lexical_loaded = False
+        self._suitability = suitability
+        self._suitability_loaded = suitability is not None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = create_embeddings()
+        return self._embeddings
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = create_index(self.backend)
+        return self._index
+
+    @property
+    def lexical_index(self):
+        """BM25 index, or None when it has not been built"""
+        if not self._lexical_loaded:
+            with self._lock:
+                if not self._lexical_loaded:
+                    self._lexical_index = create_lexical_index()
+                    self._lexical_loaded = True
+        return self._lexical_index
+
+    @property
+    def suitability(self) -> Optional[SuitabilityEngine]:
+        """Forecast suitability scorer, or None when the spot conditions have not been built"""
+        if not self._suitability_loaded:
+            with self._lock:
+                if not self._suitability_loaded:
+                    self._suitability = create_suitability_engine()
+                    self._suitability_loaded = True
+        return self._suitability
+
+    @property
+    def openai_client(self) -> "OpenAI":
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = create_openai_client()
+        return self._openai
+
+    def retriever(self) -> SurfSpotRetriever:
+        return SurfSpotRetriever(self.backend, embeddings=self.embeddings, index=self.index,
+                                 lexical_index=self.lexical_index)
+
+    def report_generator(self,
+                         spots: List[Dict],
+                         forecast: Dict,
+                         generation_model: str = 'gpt-4o',
+                         temperature: float = 0.3,
+                         **kwargs) -> SurfReportGenerator:
+        return SurfReportGenerator(spots, forecast, generation_model, temperature,
+                                   client=self.openai_client, **kwargs)
+
+    def warmup(self) -> None:
+        """Build every client and open connections so the first request skips the handshakes"""
+        steps = {
+            "forecast": get_weekend_forecast,
+            # Also seeds the embedding cache with the default UI query
+            "embeddings": lambda: self.embeddings.embed_query(DEFAULT_QUERY),
+            "openai": lambda: self.openai_client.models.list(),
+        }
+        if self.backend == "pinecone":
+            steps["index"] = lambda: self.index.describe_index_stats()
+        else:
+            steps["index"] = lambda: self.index
+        steps["lexical_index"] = lambda: self.lexical_index
+        steps["suitability"] = lambda: self.suitability
+
+        threads = [threading.Thread(target=self._warm, args=(name, step)) for name, step in steps.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    @staticmethod
+    def _warm(name, step) -> None:
+        try:
+            step()
+        except Exception as e:
+            logger.warning("Warmup of %s failed: %s", name, e)
+
+_services: Optional[SurfServices] = None
+_services_lock = threading.Lock()
+
+def get_services(warmup: bool = False) -> SurfServices:
+    """Process-wide SurfServices singleton"""
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                _services = SurfServices()
+                if warmup:
+                    _services.warmup()
+    return _services
@@ -0,0 +1,55 @@
+from typing import List, Optional, Tuple, Union
+
+# The eight boxes of the "Surf Level" widget, lowest to highest
+SURF_LEVELS = ["beginner", "beginner-intermediate", "intermediate",
+               "intermediate-advanced", "advanced", "advanced-pro", "pro", "expert-pro"]
+
+# Values of the direction_of_wave / type_of_bottom filters offered in the UI
+WAVE_DIRECTIONS = ["Right", "Left", "Left and right"]
+BOTTOM_TYPES = ["Reef", "Sand", "Sand with rocks"]
+
+# Coarse names accepted from users, mapped onto the box scale
+SKILL_LEVELS = {
+    "beginner": 0,
+    "novice": 0,
+    "intermediate": 2,
+    "advanced": 4,
+    "pro": 6,
+    "expert": 7,
+}
+
+def surf_level_range(surf_level_array: List[str]) -> Optional[Tuple[int, int]]:
+    """(min, max) index of the dark boxes, or None if the array is missing or empty"""
+    if not isinstance(surf_level_array, list) or len(surf_level_array) != len(SURF_LEVELS):
+        return None
+    dark_indices = [i for i, value in enumerate(surf_level_array) if value == "dark"]
+    if not dark_indices:
+        return None
+    return min(dark_indices), max(dark_indices)
+
+def skill_index(skill_level: Union[str, int]) -> int:
+    """Position of a skill level on the SURF_LEVELS scale"""
+    if isinstance(skill_level, int):
+        return max(0, min(len(SURF_LEVELS) - 1, skill_level))
+    level = skill_level.strip().lower()
+    if level in SURF_LEVELS:
+        return SURF_LEVELS.index(level)
+    if level in SKILL_LEVELS:
+        return SKILL_LEVELS[level]
+    raise ValueError(f"Unknown skill level: {skill_level}")
+
+def surf_level_label(level_min: int, level_max: int) -> str:
+    """Human readable range, e.g. "Beginner to Intermediate-Advanced" """
+    start = SURF_LEVELS[int(level_min)].title()
+    end = SURF_LEVELS[int(level_max)].title()
+    return start if start == end else f"{start} to {end}"
+
+def crowd_label(crowd_score: int) -> str:
+    """Map the 1-5 crowd star rating onto Low/Medium/High"""
+    if not crowd_score:
+        return "Not Specified"
+    if crowd_score <= 2:
+        return "Low"
+    if crowd_score == 3:
+        return "Medium"
+    return "High"
@@ -0,0 +1,401 @@
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Iterable, Tuple
+
+# Version 2 adds int8 embeddings, float32 rescoring copies and per-spot chunk vectors;
+# version 3 keeps the arrays in a generation subdirectory named by the manifest
+CATALOG_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+GENERATION_PREFIX = "gen-"
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.npy"
+CHUNK_ROWS_FILE = "chunk_rows.npy"
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+# Free-text fields go in an offsets-indexed blob; other strings become categorical codes
+TEXT_FIELDS = ("name", "spot_description")
+# Rows converted to float32 at a time when scoring a quantised matrix; small enough for the
+# conversion buffer to stay in cache between the conversion and the product
+SCORE_BLOCK_ROWS = 128
+CHUNK_CHARS = 600
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+
+def description_chunks(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """
+    The whole description followed by its parts: the prose in windows of whole sentences up to
+    max_chars, then each generated line (ratings, surf level, tide) on its own. Scoring a spot by
+    its best chunk keeps one aspect from being blurred by the others.
+    """
+    parts = []
+    for paragraph in text.split("\n\n"):
+        lines = [line.strip() for line in paragraph.split("\n") if line.strip()]
+        if len(lines) > 1:
+            parts.extend(lines)
+            continue
+        window = ""
+        for sentence in _SENTENCE.findall(" ".join(lines)):
+            if window and len(window) + len(sentence) > max_chars:
+                parts.append(window.strip())
+                window = ""
+            window += sentence
+        if window.strip():
+            parts.append(window.strip())
+    return [text] + [part for part in parts if part != text.strip()]
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and the float32 scale restoring each row"""
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class EmbeddingMatrix:
+    """
+    Stored embedding rows (float32, float16 or int8 with per-row scales) scored in blocks,
+    plus an optional float32 copy used to rescore a short candidate list exactly.
+    """
+    def __init__(self, stored: np.ndarray, scales: Optional[np.ndarray] = None,
+                 full: Optional[np.ndarray] = None):
+        self.stored = stored
+        self.scales = scales
+        self.full = full
+
+    def __len__(self) -> int:
+        return self.stored.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes read by a full scan (the rescoring copy is only touched row by row)"""
+        return self.stored.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @property
+    def approximate(self) -> bool:
+        return self.stored.dtype != np.float32
+
+    @property
+    def exact(self) -> Optional[np.ndarray]:
+        """float32 rows (stored or the rescoring copy); None if only quantised rows were kept"""
+        return self.full if self.approximate else self.stored
+
+    def scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n_queries, n_rows) dot products against the stored rows"""
+        n = len(self) if rows is None else len(rows)
+        if self.stored.dtype == np.float32 and rows is None:
+            return queries @ self.stored.T
+        out = np.empty((len(queries), n), dtype=np.float32)
+        # One conversion buffer reused for every block
+        buffer = np.empty((min(n, SCORE_BLOCK_ROWS), self.stored.shape[1]), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = slice(start, min(n, start + SCORE_BLOCK_ROWS))
+            index = block if rows is None else rows[block]
+            converted = buffer[:block.stop - start]
+            np.copyto(converted, self.stored[index], casting="unsafe")
+            out[:, block] = queries @ converted.T
+            if self.scales is not None:
+                out[:, block] *= self.scales[index]
+        return out
+
+    def exact_scores(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Full-precision scores for a few rows, when a float32 copy was stored"""
+        if self.full is None:
+            return self.scores(queries, rows)
+        return queries @ self.full[rows].T
+
+class _MetadataView(Sequence):
+    """Read-only list of per-spot metadata dicts, built from the columns on access"""
+    def __init__(self, catalog: "SpotCatalog"):
+        self.catalog = catalog
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.catalog.metadata(i) for i in range(*row.indices(len(self)))]
+        return self.catalog.metadata(row)
+
+class SpotCatalog:
+    """
+    Versioned on-disk spot catalog, one directory per catalog:
+
+    - ``manifest.json``: version, row count, embedding dtype, one entry per metadata field and
+      the generation subdirectory (``gen-*``) holding the arrays below
+    - ``embeddings.npy``: optional (n, d) float32/float16/int8 matrix of L2-normalised rows, with
+      ``embeddings.scales.npy`` (int8 row scales) and ``embeddings.full.npy`` (float32, for rescoring)
+    - ``chunks.npy`` + ``chunk_rows.npy``: optional chunk vectors (same layout) and their spot rows
+    - ``<field>.npy``: numeric columns (NaN where missing) and int32 codes of categorical columns
+    - ``<field>.offsets.npy`` + ``<field>.blob.npy``: UTF-8 text fields, ids and optional per-row
+      content hashes, sliced per row
+
+    Only the manifest is read on open. Arrays are memory-mapped on first use, so opening costs
+    the same for any catalog size and several processes share the same pages.
+
+    A write never touches files that readers may have mapped: it fills a new generation
+    directory and then swaps the manifest in atomically. The previous generation is kept for
+    readers that opened it and have not mapped every array yet; older ones are removed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest.get("version", 0) > CATALOG_VERSION:
+            raise ValueError(
+                f"Catalog at {path} has version {self.manifest['version']}; "
+                f"this code reads up to version {CATALOG_VERSION}"
+            )
+        self.fields: Dict[str, Dict[str, Any]] = self.manifest["fields"]
+        # Catalogs before version 3 keep their arrays next to the manifest
+        generation = self.manifest.get("generation")
+        self.data_path = os.path.join(path, generation) if generation else path
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._ids: Optional[List[str]] = None
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+    def _array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            array = np.load(os.path.join(self.data_path, name), mmap_mode="r")
+            self._arrays[name] = array
+        return array
+
+    @property
+    def ids(self) -> List[str]:
+        if self._ids is None:
+            self._ids = self._texts("_id")
+        return self._ids
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """The stored embedding array as written (int8 codes for int8 catalogs)"""
+        if not self.manifest.get("embedding_dtype"):
+            return None
+        return self._array(EMBEDDINGS_FILE)
+
+    def _matrix(self, file_name: str, spec: Dict[str, Any]) -> EmbeddingMatrix:
+        stem = file_name[:-len(".npy")]
+        return EmbeddingMatrix(
+            self._array(file_name),
+            self._array(f"{stem}.scales.npy") if spec["dtype"] == "int8" else None,
+            self._array(f"{stem}.full.npy") if spec.get("rescore") else None,
+        )
+
+    def embedding_matrix(self) -> Optional[EmbeddingMatrix]:
+        if not self.manifest.get("embedding_dtype"):
+            return None
+        return self._matrix(EMBEDDINGS_FILE, {
+            "dtype": self.manifest["embedding_dtype"], "rescore": self.manifest.get("rescore", False)
+        })
+
+    def chunk_matrix(self) -> Optional[Tuple[EmbeddingMatrix, np.ndarray]]:
+        """Chunk embeddings and the spot row of each chunk (sorted), if chunks were written"""
+        spec = self.manifest.get("chunks")
+        if not spec:
+            return None
+        return self._matrix(CHUNKS_FILE, spec), self._array(CHUNK_ROWS_FILE)
+
+    @property
+    def metadata_view(self) -> Sequence[Dict[str, Any]]:
+        return _MetadataView(self)
+
+    def content_hashes(self) -> Optional[List[str]]:
+        """Hash of the content each row was embedded from, if the writer recorded them"""
+        if not self.manifest.get("content_hashes"):
+            return None
+        return self._texts("_hash")
+
+    def _texts(self, field: str) -> List[str]:
+        offsets = self._array(f"{field}.offsets.npy")
+        blob = self._array(f"{field}.blob.npy").tobytes()
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(self))]
+
+    def text(self, field: str, row: int) -> str:
+        """One row of a text field, decoded without touching the rest of the blob"""
+        offsets = self._array(f"{field}.offsets.npy")
+        return self._array(f"{field}.blob.npy")[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def column(self, field: str) -> np.ndarray:
+        """Float column of a numeric field (NaN where missing)"""
+        if self.fields.get(field, {}).get("kind") != "number":
+            raise KeyError(f"{field} is not a numeric catalog field")
+        return self._array(f"{field}.npy")
+
+    def equal_mask(self, field: str, value: Any) -> Optional[np.ndarray]:
+        """Rows whose field equals value (any field kind); None if the field or value is unknown"""
+        spec = self.fields.get(field)
+        if spec is None:
+            return None
+        if spec["kind"] == "category":
+            if value not in spec["values"]:
+                return None
+            return self._array(f"{field}.npy") == spec["values"].index(value)
+        if spec["kind"] == "number":
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return None
+            return self.column(field) == value
+        if not isinstance(value, str) or not value:
+            return None  # missing text is stored as ""
+        return np.array([text == value for text in self._texts(field)], dtype=bool)
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        meta = {}
+        for field, spec in self.fields.items():
+            if spec["kind"] == "text":
+                meta[field] = self.text(field, row)
+            elif spec["kind"] == "category":
+                code = int(self._array(f"{field}.npy")[row])
+                if code >= 0:
+                    meta[field] = spec["values"][code]
+            else:
+                value = float(self._array(f"{field}.npy")[row])
+                if not math.isnan(value):
+                    meta[field] = int(value) if spec["integer"] else value
+        return meta
+
+    @staticmethod
+    def write(path: str,
+              ids: Sequence[str],
+              metadata: Sequence[Dict[str, Any]],
+              vectors: Optional[Sequence[Sequence[float]]] = None,
+              embedding_dtype: str = "float32",
+              text_fields: Iterable[str] = TEXT_FIELDS,
+              chunk_vectors: Optional[Sequence[Sequence[float]]] = None,
+              chunk_rows: Optional[Sequence[int]] = None,
+              rescore: bool = False,
+              content_hashes: Optional[Sequence[str]] = None) -> None:
+        """
+        Write a catalog; vectors are L2-normalised and stored as embedding_dtype.
+        chunk_vectors (one per chunk, with the spot row of each in chunk_rows) are stored the same way.
+        With rescore, quantised matrices also get a float32 copy for exact rescoring of candidates.
+        content_hashes lets a later write reuse the vectors of rows whose content is unchanged.
+        """
+        if len(ids) != len(metadata):
+            raise ValueError("ids and metadata must have matching lengths")
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {embedding_dtype}")
+        os.makedirs(path, exist_ok=True)
+        previous = _generation(path)
+        # Staged under a name pruning skips, then renamed to its generation once complete
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=path)
+        try:
+            os.chmod(staging, 0o755)
+            manifest = _write_arrays(staging, ids, metadata, vectors, embedding_dtype, set(text_fields),
+                                     chunk_vectors, chunk_rows, rescore, content_hashes)
+            manifest["generation"] = GENERATION_PREFIX + os.path.basename(staging)[len(".staging-"):]
+            os.rename(staging, os.path.join(path, manifest["generation"]))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # The manifest goes last and atomically: a catalog is only readable once complete
+        tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+        # Unlinking keeps existing mappings valid; only generations nobody can still open go
+        for name in os.listdir(path):
+            if name.startswith(GENERATION_PREFIX) and name not in (manifest["generation"], previous):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+            elif previous and name.endswith(".npy"):
+                os.remove(os.path.join(path, name))  # arrays of a pre-generation catalog
+
+def _generation(path: str) -> Optional[str]:
+    """Generation subdirectory named by the current manifest, if any"""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            return json.load(file).get("generation")
+    except (OSError, ValueError):
+        return None
+
+def _write_arrays(path: str,
+                  ids: Sequence[str],
+                  metadata: Sequence[Dict[str, Any]],
+                  vectors: Optional[Sequence[Sequence[float]]],
+                  embedding_dtype: str,
+                  text_fields: set,
+                  chunk_vectors: Optional[Sequence[Sequence[float]]],
+                  chunk_rows: Optional[Sequence[int]],
+                  rescore: bool,
+                  content_hashes: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Write every array of a catalog into path and return its manifest"""
+    manifest = {"version": CATALOG_VERSION, "count": len(ids), "embedding_dtype": None, "fields": {}}
+
+    if vectors is not None:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError("ids, vectors and metadata must have matching lengths")
+        spec = _write_matrix(path, EMBEDDINGS_FILE, matrix, embedding_dtype, rescore)
+        manifest["embedding_dtype"] = embedding_dtype
+        manifest["rescore"] = spec["rescore"]
+        manifest["dimension"] = int(matrix.shape[1])
+
+    if chunk_vectors is not None:
+        rows = np.asarray(chunk_rows, dtype=np.int32)
+        matrix = np.asarray(chunk_vectors, dtype=np.float32)
+        if matrix.ndim != 2 or rows.shape != (matrix.shape[0],):
+            raise ValueError("chunk_vectors and chunk_rows must have matching lengths")
+        if len(rows) and (rows.min() < 0 or rows.max() >= len(ids) or np.any(np.diff(rows) < 0)):
+            raise ValueError("chunk_rows must be sorted spot rows")
+        np.save(os.path.join(path, CHUNK_ROWS_FILE), rows)
+        manifest["chunks"] = _write_matrix(path, CHUNKS_FILE, matrix, embedding_dtype, rescore)
+
+    _write_text(path, "_id", [str(i) for i in ids])
+    if content_hashes is not None:
+        if len(content_hashes) != len(ids):
+            raise ValueError("ids and content_hashes must have matching lengths")
+        _write_text(path, "_hash", list(content_hashes))
+        manifest["content_hashes"] = True
+    field_names = list(dict.fromkeys(field for meta in metadata for field in meta))
+    for field in field_names:
+        values = [meta.get(field) for meta in metadata]
+        present = [v for v in values if v is not None]
+        if field in text_fields:
+            _write_text(path, field, ["" if v is None else str(v) for v in values])
+            manifest["fields"][field] = {"kind": "text"}
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+            column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            np.save(os.path.join(path, f"{field}.npy"), column)
+            manifest["fields"][field] = {
+                "kind": "number", "integer": all(isinstance(v, int) for v in present)
+            }
+        elif all(isinstance(v, (str, bool)) for v in present):
+            codes_by_value = {v: code for code, v in enumerate(dict.fromkeys(present))}
+            vocabulary = list(codes_by_value)
+            codes = np.array([codes_by_value.get(v, -1) for v in values], dtype=np.int32)
+            np.save(os.path.join(path, f"{field}.npy"), codes)
+            manifest["fields"][field] = {"kind": "category", "values": vocabulary}
+        else:
+            raise ValueError(f"Field {field} mixes types or holds unsupported values")
+    return manifest
+
+def _write_matrix(path: str, file_name: str, matrix: np.ndarray, dtype: str, rescore: bool) -> Dict[str, Any]:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    stem = file_name[:-len(".npy")]
+    if dtype == "int8":
+        codes, scales = quantize_int8(matrix)
+        np.save(os.path.join(path, file_name), codes)
+        np.save(os.path.join(path, f"{stem}.scales.npy"), scales)
+    else:
+        np.save(os.path.join(path, file_name), matrix.astype(dtype))
+    rescore = rescore and dtype != "float32"
+    if rescore:
+        np.save(os.path.join(path, f"{stem}.full.npy"), matrix)
+    return {"count": int(matrix.shape[0]), "dtype": dtype, "rescore": rescore}
+
+def _write_text(path: str, field: str, values: List[str]) -> None:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    np.save(os.path.join(path, f"{field}.offsets.npy"), offsets)
+    np.save(os.path.join(path, f"{field}.blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence
+from config import SPOT_CONDITIONS_PATH, SUITABILITY_WEIGHT
+
+# 16-point compass, clockwise from north in 22.5 degree steps
+COMPASS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+           "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+COMPASS_ANGLES = np.radians(np.arange(16) * 22.5)
+WORD_TO_POINT = {"north": "N", "south": "S", "east": "E", "west": "W"}
+# Scores are kept for this many distinct forecasts (one per forecast region in use)
+MAX_CACHED_FORECASTS = 32
+
+def _normalise_direction(token: str) -> Optional[str]:
+    """'North-West', 'northwest', 'NW' -> 'NW'"""
+    words = re.findall(r"north|south|east|west", token.lower())
+    if words:
+        return "".join(WORD_TO_POINT[w] for w in words)
+    token = token.upper()
+    return token if token in COMPASS else None
+
+def parse_directions(text: Optional[str]) -> np.ndarray:
+    """
+    Boolean mask over COMPASS for a free-text direction list such as "W, NW" or "North West".
+    "SW to NW" covers the clockwise arc between the two points.
+    """
+    mask = np.zeros(len(COMPASS), dtype=bool)
+    if not text:
+        return mask
+    for part in re.split(r"[,/;&]|\band\b|\bor\b", text, flags=re.IGNORECASE):
+        points = [_normalise_direction(p.strip()) for p in re.split(r"\bto\b|\s+-\s+", part, flags=re.IGNORECASE)]
+        points = [COMPASS.index(p) for p in points if p in COMPASS]
+        if len(points) == 2:
+            start, end = points
+            mask[[(start + step) % 16 for step in range((end - start) % 16 + 1)]] = True
+        else:
+            mask[points] = True
+    return mask
+
+def parse_swell_size(text: Optional[str]) -> List[float]:
+    """[min, max] in metres from text such as "1-3m", "0.5m to 2m" or "3-6ft"; NaN when absent"""
+    if not text:
+        return [np.nan, np.nan]
+    numbers = [float(n.replace(",", ".")) for n in re.findall(r"\d+(?:[.,]\d+)?", text)]
+    if not numbers:
+        return [np.nan, np.nan]
+    if re.search(r"ft\b|feet|foot", text.lower()):
+        numbers = [n * 0.3048 for n in numbers]
+    low, high = min(numbers), max(numbers)
+    if "+" in text and low == high:
+        high = np.inf
+    return [low, high]
+
+def direction_angle(direction: Optional[str]) -> Optional[float]:
+    point = _normalise_direction(direction or "")
+    return float(COMPASS_ANGLES[COMPASS.index(point)]) if point in COMPASS else None
+
+class SpotConditions:
+    """Per-spot numeric arrays of the scraped swell preferences, built at ingest time"""
+    def __init__(self, ids: Sequence[str], swell_dirs: np.ndarray, swell_sizes: np.ndarray):
+        self.ids = list(ids)
+        self.swell_dirs = swell_dirs    # (n, 16) bool
+        self.swell_sizes = swell_sizes  # (n, 2) float metres, NaN when unknown
+        self.positions = {spot_id: i for i, spot_id in enumerate(self.ids)}
+
+    @classmethod
+    def build(cls, ids: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> "SpotConditions":
+        return cls(
+            ids,
+            np.array([parse_directions(m.get("best_swell_direction")) for m in metadata], dtype=bool).reshape(-1, 16),
+            np.array([parse_swell_size(m.get("swell_size")) for m in metadata], dtype=float).reshape(-1, 2),
+        )
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, ids=np.array(self.ids), swell_dirs=self.swell_dirs, swell_sizes=self.swell_sizes)
+
+    @classmethod
+    def load(cls, path: str) -> "SpotConditions":
+        with np.load(path) as data:
+            # Files written before wind was dropped also hold an unused "wind_dirs" array
+            return cls(data["ids"].tolist(), data["swell_dirs"], data["swell_sizes"])
+
+def _direction_scores(masks: np.ndarray, angle: Optional[float]) -> np.ndarray:
+    """Cosine of the gap between the forecast direction and the closest preferred direction, in [0, 1]"""
+    scores = np.full(len(masks), 0.5)  # neutral when either side is unknown
+    if angle is None:
+        return scores
+    alignment = np.clip(np.cos(COMPASS_ANGLES - angle), 0, 1)  # (16,)
+    known = masks.any(axis=1)
+    scores[known] = np.where(masks[known], alignment, 0).max(axis=1)
+    return scores
+
+def _size_scores(sizes: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Share of the forecast wave-height range that falls inside each spot's working range"""
+    width = max(high - low, 0.1)
+    overlap = np.minimum(sizes[:, 1], high) - np.maximum(sizes[:, 0], low)
+    scores = np.clip(overlap / width, 0, 1)
+    # A point forecast inside the range overlaps by zero width but is a perfect match
+    inside = (sizes[:, 0] <= high) & (sizes[:, 1] >= low)
+    scores = np.where((high - low < 0.1) & inside, 1.0, scores)
+    return np.where(np.isnan(sizes).any(axis=1), 0.5, scores)
+
+class SuitabilityEngine:
+    """
+    Scores every spot against a weekend forecast in one vectorised pass.
+    Results are cached per forecast (one per region), so requests only do a dictionary lookup.
+    """
+    def __init__(self, conditions: SpotConditions, direction_weight: float = 0.6):
+        self.conditions = conditions
+        self.direction_weight = direction_weight
+        self._lock = threading.Lock()
+        # forecast fingerprint -> {spot id: score}, oldest first
+        self._scores: Dict[str, Dict[str, float]] = {}
+
+    def compute(self, forecast: Dict[str, Dict[str, Any]]) -> np.ndarray:
+        """Mean over forecast days of the weighted swell-direction and size match, in [0, 1]"""
+        n = len(self.conditions.ids)
+        if not forecast or not n:
+            return np.full(n, 0.5)
+        total = np.zeros(n)
+        for day in forecast.values():
+            direction = _direction_scores(self.conditions.swell_dirs,
+                                          direction_angle(day.get("primary_wave_direction")))
+            size = _size_scores(self.conditions.swell_sizes,
+                                day["swell_height_min"], day["swell_height_max"])
+            total += self.direction_weight * direction + (1 - self.direction_weight) * size
+        return total / len(forecast)
+
+    def scores(self, forecast: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+        """{spot id: score}, recomputed only when the forecast changes"""
+        fingerprint = hashlib.sha256(json.dumps(forecast, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        with self._lock:
+            scores = self._scores.get(fingerprint)
+            if scores is None:
+                if len(self._scores) >= MAX_CACHED_FORECASTS:
+                    del self._scores[next(iter(self._scores))]
+                scores = dict(zip(self.conditions.ids, self.compute(forecast).tolist()))
+                self._scores[fingerprint] = scores
+            return scores
+
+    def rerank(self, spots: List[Dict[str, Any]], forecast: Dict, top_k: int,
+               weight: float = SUITABILITY_WEIGHT,
+               regional_forecasts: Optional[Dict[int, Dict]] = None) -> List[Dict[str, Any]]:
+        """
+        Blend retrieval rank with forecast suitability and keep the best top_k.
+        Spots with a "forecast_region" in regional_forecasts are scored against that region's forecast.
+        """
+        regional_forecasts = regional_forecasts or {}
+        scores_by_region = {region_id: self.scores(regional) for region_id, regional in regional_forecasts.items()}
+        default_scores = self.scores(forecast)
+        n = len(spots)
+        for rank, spot in enumerate(spots):
+            scores = scores_by_region.get(spot.get("forecast_region"), default_scores)
+            spot["suitability"] = scores.get(spot["spot_id"], 0.5)
+            spot["_combined"] = (1 - weight) * (1 - rank / n) + weight * spot["suitability"]
+        reranked = sorted(spots, key=lambda s: s["_combined"], reverse=True)[:top_k]
+        for spot in spots:
+            del spot["_combined"]
+        return reranked
+
+def create_suitability_engine() -> Optional[SuitabilityEngine]:
+    # Built by pinecone_setup.py; without it retrieval order is left unchanged
+    if SPOT_CONDITIONS_PATH and os.path.exists(SPOT_CONDITIONS_PATH):
+        return SuitabilityEngine(SpotConditions.load(SPOT_CONDITIONS_PATH))
+    return None
@@ -0,0 +1,295 @@
+import atexit
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from config import TRACE_OUTPUT, METRICS_PATH, METRICS_FLUSH_SECONDS, PROFILE_REQUESTS, PROFILE_DIR
+
+# Request tracing, in-process metrics and opt-in profiling. Everything is written to stdout or
+# local files (see the TRACE_OUTPUT / METRICS_PATH / PROFILE_REQUESTS settings in config.py).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    escaped = [
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels
+    ]
+    return "{" + ",".join(escaped) + "}" if escaped else ""
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        bounds = [repr(b) for b in self.buckets] + ["+Inf"]
+        return list(zip(bounds, itertools.accumulate(self.counts)))
+
+class Metrics:
+    """Thread-safe counters and histograms, exported as Prometheus text or JSON"""
+    def __init__(self):
+        self._counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[_LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {"labels": dict(key), "count": h.count, "sum": h.sum, "buckets": dict(h.cumulative())}
+                        for key, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for bound, count in h.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Replace `path` with the current metrics: JSON for *.json, Prometheus text otherwise"""
+        text = json.dumps(self.snapshot(), indent=4) if path.endswith(".json") else self.render_prometheus()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+
+    def maybe_flush(self) -> None:
+        """Write METRICS_PATH if it is set and METRICS_FLUSH_SECONDS have passed since the last write"""
+        if not METRICS_PATH or time.monotonic() - self._last_flush < METRICS_FLUSH_SECONDS:
+            return
+        self._last_flush = time.monotonic()
+        self.write(METRICS_PATH)
+
+metrics = Metrics()
+if METRICS_PATH:
+    atexit.register(metrics.write, METRICS_PATH)
+
+@dataclass
+class Span:
+    name: str
+    trace_id: Optional[str]
+    span_id: int
+    parent_id: Optional[int]
+    start: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+class _Trace:
+    """Spans of one request, appended from whichever threads ran its stages"""
+    def __init__(self, name: str, profile: Iterable[str]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.profile = set(profile)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+_current_trace: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+_span_ids = itertools.count(1)
+# Python 3.12+ allows one active cProfile per process: concurrent stages skip profiling instead of failing
+_profiler_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_memory_traces = 0
+_trace_lock = threading.Lock()
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    """An enabled profiler holding _profiler_lock, or None if one is already running"""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool is active in this process
+        _profiler_lock.release()
+        return None
+    return profiler
+
+@contextmanager
+def span(name: str, profile: bool = False, **attributes):
+    """
+    Time a block: records surf_stage_seconds{stage=name}, counts surf_errors_total on exceptions
+    and, inside a request_trace, adds the span to the trace. Work handed to other threads stays
+    in the trace when submitted with contextvars.copy_context().run.
+    With profile=True and "cpu" profiling on, the block is run under cProfile, unless another
+    block is already being profiled; skipped blocks get a profile="skipped" attribute.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id if trace else None, next(_span_ids),
+                   parent.span_id if parent else None, time.time(), attributes=attributes)
+    token = _current_span.set(current)
+    profiler = None
+    if profile and trace is not None and "cpu" in trace.profile:
+        profiler = _start_profiler()
+        if profiler is None:
+            current.attributes["profile"] = "skipped"
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        metrics.inc("surf_errors_total", stage=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{trace.trace_id}.{name}.prof"))
+        _current_span.reset(token)
+        metrics.observe("surf_stage_seconds", current.duration, stage=name)
+        if trace is not None:
+            trace.add(current)
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+@contextmanager
+def request_trace(name: str, profile: Optional[Iterable[str]] = None, **attributes):
+    """
+    Root span of a request. On exit the span tree goes to TRACE_OUTPUT and, with "memory"
+    profiling, the top allocations go to PROFILE_DIR. Nested calls are plain spans.
+    `profile` overrides PROFILE_REQUESTS for this request.
+    """
+    if _current_trace.get() is not None:
+        with span(name, **attributes) as nested:
+            yield nested
+        return
+
+    trace = _Trace(name, PROFILE_REQUESTS if profile is None else profile)
+    token = _current_trace.set(trace)
+    memory = "memory" in trace.profile
+    if memory:
+        _start_memory_profile()
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        if memory:
+            _finish_memory_profile(trace)
+        _current_trace.reset(token)
+        _export_trace(trace)
+        metrics.maybe_flush()
+
+def _start_memory_profile() -> None:
+    global _memory_traces
+    with _memory_lock:
+        if _memory_traces == 0:
+            tracemalloc.start()
+        _memory_traces += 1
+
+def _finish_memory_profile(trace: _Trace) -> None:
+    # tracemalloc is process-wide: with concurrent requests, allocations of all of them are included
+    global _memory_traces
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    with _memory_lock:
+        _memory_traces -= 1
+        if _memory_traces == 0:
+            tracemalloc.stop()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{trace.trace_id}.memory.txt"), "w", encoding="utf-8") as file:
+        file.write(f"{trace.name} peak traced memory: {peak / 1024:.1f} KiB\n")
+        for stat in snapshot.statistics("lineno")[:25]:
+            file.write(f"{stat}\n")
+
+def _export_trace(trace: _Trace) -> None:
+    if not TRACE_OUTPUT:
+        return
+    root = next((s for s in trace.spans if s.parent_id is None), None)
+    record = json.dumps({
+        "trace_id": trace.trace_id,
+        "name": trace.name,
+        "duration": root.duration if root else None,
+        "spans": [asdict(s) for s in sorted(trace.spans, key=lambda s: s.start)],
+    }, ensure_ascii=False, default=str)
+    with _trace_lock:
+        if TRACE_OUTPUT == "stdout":
+            sys.stdout.write(record + "\n")
+            sys.stdout.flush()
+        else:
+            directory = os.path.dirname(TRACE_OUTPUT)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(TRACE_OUTPUT, "a", encoding="utf-8") as file:
+                file.write(record + "\n")
@@ -0,0 +1,58 @@
+import math
+import re
+from functools import lru_cache
+from typing import List
+
+CHARS_PER_TOKEN = 4
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    # Imported on the first count rather than at startup
+    try:
+        import tiktoken
+    except ImportError:  # optional: counts fall back to a characters-per-token estimate
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Exact with tiktoken installed, otherwise an estimate"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """Cut text to max_tokens, backing off to the last full sentence when that keeps most of it"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text)[:max_tokens])
+    sentence_ends = [m.end() for m in SENTENCE_END.finditer(cut)]
+    if sentence_ends and sentence_ends[-1] >= len(cut) // 2:
+        return cut[:sentence_ends[-1]]
+    return cut.rstrip() + "..."
+
+def pack_descriptions(descriptions: List[str], budget: int, model: str = "gpt-4o") -> List[str]:
+    """
+    Share a token budget across descriptions: short ones are kept whole and
+    what they leave unused goes to the longer ones, instead of a fixed cut per spot.
+    """
+    lengths = [count_tokens(text, model) for text in descriptions]
+    allocation = [0] * len(descriptions)
+    remaining = budget
+    order = sorted(range(len(descriptions)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocation[i] = min(lengths[i], share)
+        remaining -= allocation[i]
+    return [
+        text if allocation[i] >= lengths[i] else truncate_to_tokens(text, allocation[i], model)
+        for i, text in enumerate(descriptions)
+    ]
@@ -0,0 +1,234 @@
+import json
+import os
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence
+from spot_catalog import SpotCatalog, EmbeddingMatrix
+
+# Layout written before the spot catalog; still readable
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+
+# With a float32 rescoring copy, rescore this many times top_k candidates of the quantised scan
+RESCORE_DEPTH = 4
+
+RANGE_OPERATORS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+class LocalVectorIndex:
+    """
+    In-process cosine index over a memory-mapped float32/float16/int8 matrix.
+    Answers the subset of the Pinecone ``Index.query`` API used by SurfSpotRetriever.
+    Reads a SpotCatalog directory; filter masks and metadata come from its columns on demand.
+    Quantised catalogs are scanned approximately, and the best candidates rescored when a float32 copy was stored;
+    catalogs with chunk vectors score each spot by its best-matching chunk.
+    """
+    def __init__(self, path: str, rescore_depth: int = RESCORE_DEPTH):
+        self.path = path
+        self.rescore_depth = rescore_depth
+        self.catalog: Optional[SpotCatalog] = None
+        self.chunks: Optional[EmbeddingMatrix] = None
+        if SpotCatalog.exists(path):
+            self.catalog = SpotCatalog(path)
+            if self.catalog.embeddings is None:
+                raise ValueError(f"Catalog at {path} has no embeddings")
+            # Rows are L2-normalised on write, so cosine similarity is a plain dot product
+            self.matrix = self.catalog.embedding_matrix()
+            chunks = self.catalog.chunk_matrix()
+            if chunks is not None:
+                self.chunks, chunk_rows = chunks
+                # Chunks of spot row r are chunks[offsets[r]:offsets[r + 1]]
+                self._chunk_offsets = np.searchsorted(chunk_rows, np.arange(len(self.catalog) + 1))
+            self.ids = self.catalog.ids
+            self.metadata = self.catalog.metadata_view
+            self._masks: Dict[str, Dict[Any, np.ndarray]] = {}
+            self._columns: Dict[str, np.ndarray] = {}
+        else:
+            self.matrix = EmbeddingMatrix(np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r"))
+            with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as file:
+                stored = json.load(file)
+            self.ids = stored["ids"]
+            self.metadata = stored["metadata"]
+            self._masks = self._build_masks()
+            self._columns = self._build_columns()
+        if len(self.ids) != len(self.matrix):
+            raise ValueError(
+                f"Index at {path} has {len(self.matrix)} vectors but {len(self.ids)} ids"
+            )
+        self.vectors = self.matrix.stored
+
+    @staticmethod
+    def save(path: str,
+             ids: Sequence[str],
+             vectors: Sequence[Sequence[float]],
+             metadata: Sequence[Dict[str, Any]],
+             embedding_dtype: str = "float32",
+             chunk_vectors: Optional[Sequence[Sequence[float]]] = None,
+             chunk_rows: Optional[Sequence[int]] = None,
+             rescore: bool = False) -> None:
+        """Write ids, normalised vectors (and optional chunk vectors) and metadata as a spot catalog"""
+        if len(ids) != len(metadata):
+            raise ValueError("ids, vectors and metadata must have matching lengths")
+        SpotCatalog.write(path, ids, metadata, vectors, embedding_dtype,
+                          chunk_vectors=chunk_vectors, chunk_rows=chunk_rows, rescore=rescore)
+
+    @property
+    def scan_bytes(self) -> int:
+        """Bytes of embedding data read by an unfiltered query"""
+        return (self.matrix if self.chunks is None else self.chunks).nbytes
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray], exact: bool) -> np.ndarray:
+        """(n_queries, n_rows) spot scores; rows=None means every spot"""
+        if self.chunks is None:
+            if exact:
+                return self.matrix.exact_scores(queries, np.arange(len(self.ids)) if rows is None else rows)
+            return self.matrix.scores(queries, rows)
+        # Max-pool over each spot's chunks
+        rows = np.arange(len(self.ids)) if rows is None else rows
+        starts = self._chunk_offsets[rows]
+        counts = self._chunk_offsets[rows + 1] - starts
+        pooled = np.empty((len(queries), len(rows)), dtype=np.float32)
+        has_chunks = counts > 0
+        if not has_chunks.all():
+            # Spots without chunks are scored by their own vector
+            plain = rows[~has_chunks]
+            pooled[:, ~has_chunks] = (self.matrix.exact_scores(queries, plain) if exact
+                                      else self.matrix.scores(queries, plain))
+        if has_chunks.any():
+            starts, counts = starts[has_chunks], counts[has_chunks]
+            ends = np.cumsum(counts)
+            chunk_index = np.repeat(starts - ends + counts, counts) + np.arange(ends[-1])
+            if exact:
+                chunk_scores = self.chunks.exact_scores(queries, chunk_index)
+            else:
+                # Every chunk, in order, when scanning the whole catalog
+                whole = len(chunk_index) == len(self.chunks)
+                chunk_scores = self.chunks.scores(queries, None if whole else chunk_index)
+            pooled[:, has_chunks] = np.maximum.reduceat(chunk_scores, ends - counts, axis=1)
+        return pooled
+
+    def _equal_mask(self, field: str, value: Any) -> Optional[np.ndarray]:
+        if self.catalog is None:
+            return self._masks.get(field, {}).get(value)
+        by_value = self._masks.setdefault(field, {})
+        if value not in by_value:
+            by_value[value] = self.catalog.equal_mask(field, value)
+        return by_value[value]
+
+    def _range_column(self, field: str) -> Optional[np.ndarray]:
+        if self.catalog is None or field in self._columns:
+            return self._columns.get(field)
+        if self.catalog.fields.get(field, {}).get("kind") != "number":
+            return None
+        return self._columns.setdefault(field, self.catalog.column(field))
+
+    def _build_masks(self) -> Dict[str, Dict[Any, np.ndarray]]:
+        """Precompute one boolean row mask per (field, value) pair"""
+        masks: Dict[str, Dict[Any, np.ndarray]] = {}
+        n = len(self.ids)
+        for row, meta in enumerate(self.metadata):
+            for field, value in meta.items():
+                if not isinstance(value, (str, int, float, bool)):
+                    continue
+                by_value = masks.setdefault(field, {})
+                if value not in by_value:
+                    by_value[value] = np.zeros(n, dtype=bool)
+                by_value[value][row] = True
+        return masks
+
+    def _build_columns(self) -> Dict[str, np.ndarray]:
+        """Numeric metadata as float columns (NaN where missing) for range filters"""
+        fields = {
+            field
+            for meta in self.metadata
+            for field, value in meta.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        columns = {}
+        for field in fields:
+            column = np.full(len(self.ids), np.nan)
+            for row, meta in enumerate(self.metadata):
+                value = meta.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    column[row] = value
+            columns[field] = column
+        return columns
+
+    def _resolve_filter(self, metadata_filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Combine precomputed masks for a Pinecone-style ``$eq``/range filter"""
+        if not metadata_filter:
+            return None
+        combined = np.ones(len(self.ids), dtype=bool)
+        for field, condition in metadata_filter.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$eq":
+                    mask = self._equal_mask(field, value)
+                    if mask is None:
+                        return np.zeros(len(self.ids), dtype=bool)
+                elif op in RANGE_OPERATORS:
+                    column = self._range_column(field)
+                    if column is None:
+                        return np.zeros(len(self.ids), dtype=bool)
+                    mask = RANGE_OPERATORS[op](column, value)  # NaN compares False
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                combined &= mask
+        return combined
+
+    def query_batch(self,
+                    vectors: Sequence[Sequence[float]],
+                    top_k: int = 3,
+                    filter: Optional[Dict[str, Any]] = None,
+                    include_metadata: bool = True) -> List[Dict[str, Any]]:
+        """Top-k cosine search for several query vectors in one matrix product"""
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        mask = self._resolve_filter(filter)
+        rows = np.arange(len(self.ids)) if mask is None else np.flatnonzero(mask)
+
+        k = min(top_k, len(rows))
+        if k <= 0:
+            return [{"matches": []} for _ in range(len(queries))]
+
+        scores = self._scores(queries, None if mask is None else rows, exact=False)  # (n_queries, n_rows)
+        rescore = (self.matrix if self.chunks is None else self.chunks).full is not None
+        depth = min(len(rows), k * self.rescore_depth) if rescore else k
+        if depth < len(rows):
+            top = np.argpartition(-scores, depth - 1, axis=1)[:, :depth]
+        else:
+            top = np.tile(np.arange(len(rows)), (len(queries), 1))
+
+        results = []
+        for q in range(len(queries)):
+            candidates = top[q]
+            candidate_scores = scores[q, candidates]
+            if rescore:
+                # Exact float32 scores for the shortlist of the approximate scan
+                candidate_scores = self._scores(queries[q:q + 1], rows[candidates], exact=True)[0]
+            order = np.argsort(-candidate_scores)[:k]
+            matches = []
+            for col in order:
+                row = int(rows[candidates[col]])
+                match = {"id": self.ids[row], "score": float(candidate_scores[col])}
+                if include_metadata:
+                    match["metadata"] = self.metadata[row]
+                matches.append(match)
+            results.append({"matches": matches})
+        return results
+
+    def query(self,
+              vector: Sequence[float],
+              top_k: int = 3,
+              filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True) -> Dict[str, Any]:
+        """Single-vector search with the same signature as ``pinecone.Index.query``"""
+        return self.query_batch([vector], top_k, filter, include_metadata)[0]